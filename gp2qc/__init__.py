@@ -1,9 +1,45 @@
-from .test import testing, another_function
-from .processing import GP2SampleManifesstProcessor
-from .consistency import StudyManifestHandler
-from .save_df_to_gdrive import save_df_to_gdrive
-from .remove_sample_ids import remove_sample_ids
-from .base_check import base_check
-from .add_sample_ids import add_sample_ids
-from .check_idstracker import check_idstracker
-from .get_gp2idsmapper import get_gp2idsmapper
+# Public functions are imported on first access (PEP 562) so that `import gp2qc`
+# neither loads pandas/google-cloud-storage nor creates a storage client.
+import importlib
+import sys
+
+_lazy_attributes = {
+    'testing': '.test',
+    'another_function': '.test',
+    'GP2SampleManifesstProcessor': '.processing',
+    'StudyManifestHandler': '.consistency',
+    'save_df_to_gdrive': '.save_df_to_gdrive',
+    'remove_sample_ids': '.remove_sample_ids',
+    'base_check': '.base_check',
+    'ValidationReport': '.validation_report',
+    'add_sample_ids': '.add_sample_ids',
+    'check_idstracker': '.check_idstracker',
+    'get_gp2idsmapper': '.get_gp2idsmapper',
+    'shard_gp2idsmapper': '.mapper_cache',
+    'export_gp2idsmapper': '.mapper_cache',
+    'audit_gp2idsmapper': '.mapper_audit',
+    'run_batch': '.batch',
+    'tracing': '.instrumentation',
+    'load_corrections': '.corrections',
+    'BlobService': '.blob_service',
+    'GCSBackend': '.storage_backend',
+    'LocalBackend': '.storage_backend',
+}
+
+__all__ = list(_lazy_attributes)
+
+
+def __getattr__(name):
+    if name not in _lazy_attributes:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    importlib.import_module(_lazy_attributes[name], __name__)
+    # Importing a submodule binds it as a package attribute (e.g. gp2qc.base_check the module),
+    # so re-bind every public name whose module is loaded to the function it stands for.
+    for attr, module_name in _lazy_attributes.items():
+        module = sys.modules.get(f'{__name__}{module_name}')
+        if module is not None:
+            globals()[attr] = getattr(module, attr)
+    return globals()[name]
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,17 +1,16 @@
-import json
-from datetime import datetime
-from google.cloud import storage
+from .storage_backend import as_backend
+from .id_format import NON_STANDARD_PATTERN, find_id_format_errors, id_format_message
+from .id_registry import GP2IDRegistry, collision_message
+from .instrumentation import stage
+from .mapper_cache import load_masterids, update_masterids
 
-# Fixed bucket and storage client
+# Default bucket ($GP2QC_STORAGE_ROOT/<bucket_name> when set); the storage client is created on first use
 bucket_name = 'eu-samplemanifest'
-storage_client = storage.Client()
-bucket = storage_client.get_bucket(bucket_name)
 
 
 def detect_unusal_strings(s):
     # function to identify non standard pattern values in the series
-    non_standard_pattern = r'[^\w\-/(). :=]|^\s|\s$|[^\x00-\x7F]'
-    idx = s.str.contains(non_standard_pattern)
+    idx = s.str.contains(NON_STANDARD_PATTERN)
   
     # return error if any non standard pattern is found
     if idx.any():
@@ -20,13 +19,16 @@ def detect_unusal_strings(s):
         print('OK')
         return None
 
-def add_sample_ids(df):
+@stage('add_sample_ids')
+def add_sample_ids(df, bucket=None):
     """
     Adds entries from a DataFrame to GP2IDSMAPPER.json.
     
     Args:
         df (pandas.DataFrame): DataFrame containing 'study', 'sample_id', 'GP2sampleID', 'clinical_id' columns.
+        bucket (StorageBackend, optional): Storage holding IDSTRACKER. Defaults to the eu-samplemanifest bucket.
     """
+    bucket = as_backend(bucket or bucket_name)
     
     if df.shape[0]!=df.drop_duplicates(['study', 'sample_id']).shape[0]:
         raise ValueError("Duplicate sample IDs found in the DataFrame.")
@@ -34,68 +36,41 @@ def add_sample_ids(df):
     if df.shape[0]!=df.drop_duplicates(['GP2sampleID']).shape[0]:
         raise ValueError("Duplicate GP2 sample IDs found in the DataFrame.")
     
-    # check if the string in the GP2sampleID starts with the string in the study column
-    mismatch = df.apply(lambda row: not row['GP2sampleID'].startswith(row['study']), axis=1)
-    if mismatch.any():
-        mismatched_rows = df[mismatch]
-        raise ValueError(f"GP2sampleID does not start with the study name for these rows:\n{mismatched_rows}")
-    
+    # sample_id/clinical_id characters, GP2sampleID prefix (study) and structure, all rows at once
+    print('ID format check:')
+    format_errors = find_id_format_errors(df)
+    if not format_errors.empty:
+        format_errors.join(df[['study', 'sample_id', 'GP2sampleID', 'clinical_id']], on='index').to_csv(
+            'malformed_ids.csv', index=False)
+        raise ValueError(f"{id_format_message(format_errors)}\n> 'malformed_ids.csv' saved.")
+    print('OK')
 
     print("Starting entry addition process...")
     print('sample_ids to add:')
     print(df.study.value_counts())
-    
-    print('sample_id format check:')
-    detect_unusal_strings(df['sample_id'])
-    print('clinical_id format check:')
-    detect_unusal_strings(df['clinical_id'])
 
-    # Load the ID data from GP2IDSMAPPER.json
-    blob_id = bucket.blob('IDSTRACKER/GP2IDSMAPPER.json')
+    # Load the studies' IDs (downloaded only if changed since the last load)
+    studies = df['study'].unique().tolist()
     try:
-        masterids = json.loads(blob_id.download_as_text())
+        masterids = load_masterids(bucket, studies=studies)
     except Exception as e:
         print(f"Error loading ID data: {e}")
         return
     
-    # Backup the current GP2IDSMAPPER.json
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-    new_blob_name = f'IDSTRACKER/ARCHIVE/GP2IDSMAPPER_before_add_{timestamp}.json'
-    
-    try:
-        bucket.copy_blob(blob_id, bucket, new_blob_name)
-        print(f"Original GP2IDSMAPPER.json copied to gs://{bucket_name}/{new_blob_name}")
-    except Exception as e:
-        print(f"Error copying file: {e}")
-        return
+    # Check all rows against the hash indexes of the mapper before touching anything
+    collisions = GP2IDRegistry(masterids).find_collisions(df)
+    if not collisions.empty:
+        collisions.to_csv('colliding_ids.csv', index=False)
+        raise ValueError(f"{collision_message(collisions)}\n> 'colliding_ids.csv' saved.\n{collisions}")
 
-    # Process the DataFrame and add to the JSON
-    for _, row in df.iterrows():
-        study = row['study']
-        sample_id = row['sample_id']
-        gp2sampleid = row['GP2sampleID']
-        clinical_id = row['clinical_id']
-        
-        # Check if the study exists in the master file
-        if study not in masterids:
-            masterids[study] = {}
-        
-        # check if the sample_id already exists in the study
-        if sample_id in masterids[study]:
-            raise ValueError(f"Sample ID {sample_id} already exists in study {study}.")
-        
-        # check if the GP2sampleID already exists in the study
-        if gp2sampleid in [x[0] for x in masterids[study].values()]:
-            raise ValueError(f"GP2sampleID {gp2sampleid} already exists in study {study}.")    
+    def insert(study, study_ids):
+        GP2IDRegistry({study: study_ids}).bulk_insert(df[df['study'] == study])
 
-        # Add or update the sample_id for the study
-        masterids[study][sample_id] = [gp2sampleid, clinical_id]
-        # print(f"Added/Updated {sample_id} for study {study}.")
-    
-    # Save the updated GP2IDSMAPPER.json
+    # Backup and write only if nobody changed the IDs in between (re-checked and retried otherwise)
     try:
-        blob_id.upload_from_string(json.dumps(masterids, indent=4))
-        print("Updated GP2IDSMAPPER.json saved successfully.")
+        update_masterids(bucket, studies, insert, 'before_add')
+    except ValueError:
+        raise
     except Exception as e:
         print(f"Error saving updated GP2IDSMAPPER.json: {e}")
         return
@@ -0,0 +1,117 @@
+import json
+import random
+import time
+import numpy as np
+import pandas as pd
+from .mapper_shards import MAX_RETRIES
+from .storage_backend import GenerationMismatch
+
+# Per-GP2ID summary of the finalized manifests of a study, kept next to them in the finalized folder.
+# One row per (GP2ID, column) with the latest value, the distinct values and the row-aligned history
+# (SampleRepNos, values, manifest_ids), so a new manifest can be checked for inconsistencies
+# without loading all previous manifests.
+ATTRIBUTE_SUMMARY_FILE = 'attribute_summary.json'
+ATTRIBUTE_COLUMNS = ['clinical_id', 'biological_sex_for_qc', 'race_for_qc', 'family_history_for_qc',
+                     'region_for_qc', 'study_type', 'GP2_phenotype']
+SUMMARY_COLUMNS = ['study', 'GP2ID', 'column', 'latest_value', 'latest_SampleRepNo', 'n_values',
+                   'distinct_values', 'SampleRepNos', 'values', 'manifest_ids']
+HISTORY_COLUMNS = ['study', 'GP2ID', 'column', 'SampleRepNo', 'value', 'manifest_id']
+
+
+def to_long(df, columns):
+    """One row per (row of df, column) with 'study', 'GP2ID', 'column', 'SampleRepNo', 'value' and 'manifest_id'."""
+    long = df[['study', 'GP2ID', 'SampleRepNo', 'manifest_id'] + list(columns)].melt(
+        id_vars=['study', 'GP2ID', 'SampleRepNo', 'manifest_id'], value_vars=list(columns),
+        var_name='column', value_name='value')
+    long['value'] = long['value'].astype(object)
+    long.loc[long['value'].isna(), 'value'] = None  # NaN and <NA> must count as the same value
+    return long[HISTORY_COLUMNS]
+
+def sort_by_sample_rep_no(long):
+    """Sort by GP2ID, column and SampleRepNo in numeric order (s2 < s10)."""
+    rep_no = pd.to_numeric(long['SampleRepNo'].astype(str).str.lstrip('s'), errors='coerce')
+    return long.iloc[np.lexsort([rep_no.to_numpy(), long['column'].to_numpy(), long['GP2ID'].to_numpy()])]
+
+def _summarize(long):
+    if long.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+    long = sort_by_sample_rep_no(long)
+    grouped = long.groupby(['GP2ID', 'column'], sort=False)
+    summary = long.drop_duplicates(subset=['GP2ID', 'column'], keep='last').set_index(['GP2ID', 'column'])[
+        ['study', 'value', 'SampleRepNo']].rename(columns={'value': 'latest_value', 'SampleRepNo': 'latest_SampleRepNo'})
+    summary['n_values'] = grouped['value'].nunique(dropna=False)
+    summary['distinct_values'] = grouped['value'].unique().apply(list)
+    summary['SampleRepNos'] = grouped['SampleRepNo'].agg(list)
+    summary['values'] = grouped['value'].agg(list)
+    summary['manifest_ids'] = grouped['manifest_id'].agg(list)
+    return summary.reset_index()[SUMMARY_COLUMNS]
+
+def history(summary):
+    """Expand the summary back to one row per (manifest row, column) with HISTORY_COLUMNS."""
+    if summary.empty:
+        return pd.DataFrame(columns=HISTORY_COLUMNS)
+    long = summary[['study', 'GP2ID', 'column', 'SampleRepNos', 'values', 'manifest_ids']].explode(
+        ['SampleRepNos', 'values', 'manifest_ids'])
+    long = long.rename(columns={'SampleRepNos': 'SampleRepNo', 'values': 'value', 'manifest_ids': 'manifest_id'})
+    return long[HISTORY_COLUMNS].reset_index(drop=True)
+
+def build_attribute_summary(df, columns=ATTRIBUTE_COLUMNS):
+    """
+    Build the summary of the manifests in df (e.g. StudyManifestHandler.mf after load_previous_manifests).
+
+    Returns:
+        pandas.DataFrame: One row per (GP2ID, column) with SUMMARY_COLUMNS.
+    """
+    return _summarize(to_long(df, [column for column in columns if column in df.columns]))
+
+def merge_attribute_summary(summary, df):
+    """
+    Add the rows of a newly finalized manifest to the summary. Only the (GP2ID, column) pairs of df are recomputed;
+    rows of the same manifest_id already in the summary are replaced (re-finalized manifest).
+    """
+    columns = [column for column in summary['column'].unique() if column in df.columns] if not summary.empty \
+        else [column for column in ATTRIBUTE_COLUMNS if column in df.columns]
+    affected = summary['GP2ID'].isin(df['GP2ID'])
+    previous = history(summary[affected])
+    previous = previous[~previous['manifest_id'].isin(df['manifest_id'].unique())]
+    updated = _summarize(pd.concat([previous, to_long(df, columns)], ignore_index=True))
+    return pd.concat([summary[~affected], updated], ignore_index=True)
+
+def load_attribute_summary(drive, folder):
+    """
+    Read the summary of a finalized folder.
+
+    Returns:
+        tuple: (summary, generation), or (None, None) if the folder has no summary yet.
+    """
+    path = f'{folder}/{ATTRIBUTE_SUMMARY_FILE}'
+    generation = drive.generation(path)
+    if generation is None:
+        return None, None
+    records = json.loads(drive.read_bytes(path, generation=generation).decode('utf-8'))
+    return pd.DataFrame(records, columns=SUMMARY_COLUMNS), generation
+
+def save_attribute_summary(drive, folder, summary, if_generation_match=None):
+    """Write the summary of a finalized folder and return its generation."""
+    records = summary[SUMMARY_COLUMNS].to_json(orient='records', default_handler=str)
+    return drive.write_bytes(f'{folder}/{ATTRIBUTE_SUMMARY_FILE}', records, if_generation_match=if_generation_match,
+                             content_type='application/json')
+
+def update_attribute_summary(drive, folder, df):
+    """
+    Merge a newly finalized manifest into the summary of its folder, retrying if the summary is updated concurrently.
+    Nothing is done if the folder has no summary yet (build it with StudyManifestHandler.materialize_attribute_summary).
+
+    Returns:
+        bool: True if the summary was updated.
+    """
+    for attempt in range(MAX_RETRIES):
+        summary, generation = load_attribute_summary(drive, folder)
+        if summary is None:
+            return False
+        try:
+            save_attribute_summary(drive, folder, merge_attribute_summary(summary, df), if_generation_match=generation)
+            return True
+        except GenerationMismatch:
+            time.sleep(random.uniform(0.1, 0.5) * (attempt + 1))
+    raise RuntimeError(f'Could not update {drive.uri(folder)}/{ATTRIBUTE_SUMMARY_FILE} after {MAX_RETRIES} attempts')
@@ -1,7 +1,59 @@
 import numpy as np
 import pandas as pd
+from .id_format import find_id_format_errors, id_format_message
+from .instrumentation import stage
+from .validation_report import ValidationReport
 
 
+ALLOWED_VALUES = {
+    'GP2_phenotype': ['PD', 'Control', 'Prodromal', 'PSP', 'CBD/CBS', 'MSA', 'DLB', 'LBD',
+                      'AD', 'FTD', "VaD", "VaPD", 'Population Control', 'Undetermined-MCI',
+                      'Undetermined-Dementia', 'Mix', 'Other'],
+    'study_type': ['Case(/Control)', 'Prodromal', 'Genetically Enriched', 'Population Cohort', 'Brain Bank', 'Monogenic'],
+    'biological_sex_for_qc': ['Male', 'Female', 'Other/Unknown/Not Reported'],
+    'race_for_qc': ['American Indian or Alaska Native', 'Asian', 'White',
+                    'Black or African American', 'Hispanic or Latino', 'Multi-racial', 'Native Hawaiian or Other Pacific Islander',
+                    'Other', 'Unknown', 'Not Reported'],
+    'family_history_for_qc': ['Yes', 'No', 'Not Reported', 'Unknown'],
+    # 'family_history_other_for_qc': ['Yes', 'No', 'Not Reported', 'Unknown'],
+    'region_for_qc': ['ABW', 'AFG', 'AGO', 'AIA', 'ALA', 'ALB', 'AND', 'ARE', 'ARG', 'ARM', 'ASM', 'ATA', 'ATF', 'ATG', 'AUS', 'AUT', 'AZE',
+                      'BDI', 'BEL', 'BEN', 'BES', 'BFA', 'BGD', 'BGR', 'BHR', 'BHS', 'BIH', 'BLM', 'BLR', 'BLZ', 'BMU', 'BOL', 'BRA', 'BRB',
+                      'BRN', 'BTN', 'BVT', 'BWA', 'CAF', 'CAN', 'CCK', 'CHE', 'CHL', 'CHN', 'CIV', 'CMR', 'COD', 'COG', 'COK', 'COL', 'COM',
+                      'CPV', 'CRI', 'CUB', 'CUW', 'CXR', 'CYM', 'CYP', 'CZE', 'DEU', 'DJI', 'DMA', 'DNK', 'DOM', 'DZA', 'ECU', 'EGY', 'ERI',
+                      'ESH', 'ESP', 'EST', 'ETH', 'FIN', 'FJI', 'FLK', 'FRA', 'FRO', 'FSM', 'GAB', 'GBR', 'GEO', 'GGY', 'GHA', 'GIB', 'GIN',
+                      'GLP', 'GMB', 'GNB', 'GNQ', 'GRC', 'GRD', 'GRL', 'GTM', 'GUF', 'GUM', 'GUY', 'HKG', 'HMD', 'HND', 'HRV', 'HTI', 'HUN',
+                      'IDN', 'IMN', 'IND', 'IOT', 'IRL', 'IRN', 'IRQ', 'ISL', 'ISR', 'ITA', 'JAM', 'JEY', 'JOR', 'JPN', 'KAZ', 'KEN', 'KGZ',
+                      'KHM', 'KIR', 'KNA', 'KOR', 'KWT', 'LAO', 'LBN', 'LBR', 'LBY', 'LCA', 'LIE', 'LKA', 'LSO', 'LTU', 'LUX', 'LVA', 'MAC',
+                      'MAF', 'MAR', 'MCO', 'MDA', 'MDG', 'MDV', 'MEX', 'MHL', 'MKD', 'MLI', 'MLT', 'MMR', 'MNE', 'MNG', 'MNP', 'MOZ', 'MRT',
+                      'MSR', 'MTQ', 'MUS', 'MWI', 'MYS', 'MYT', 'NAM', 'NCL', 'NER', 'NFK', 'NGA', 'NIC', 'NIU', 'NLD', 'NOR', 'NPL', 'NRU',
+                      'NZL', 'OMN', 'PAK', 'PAN', 'PCN', 'PER', 'PHL', 'PLW', 'PNG', 'POL', 'PRI', 'PRK', 'PRT', 'PRY', 'PSE', 'PYF', 'QAT',
+                      'REU', 'ROU', 'RUS', 'RWA', 'SAU', 'SDN', 'SEN', 'SGP', 'SGS', 'SHN', 'SJM', 'SLB', 'SLE', 'SLV', 'SMR', 'SOM', 'SPM',
+                      'SRB', 'SSD', 'STP', 'SUR', 'SVK', 'SVN', 'SWE', 'SWZ', 'SXM', 'SYC', 'SYR', 'TCA', 'TCD', 'TGO', 'THA', 'TJK', 'TKL',
+                      'TKM', 'TLS', 'TON', 'TTO', 'TUN', 'TUR', 'TUV', 'TWN', 'TZA', 'UGA', 'UKR', 'UMI', 'URY', 'USA', 'UZB', 'VAT', 'VCT',
+                      'VEN', 'VGB', 'VIR', 'VNM', 'VUT', 'WLF', 'WSM', 'YEM', 'ZAF', 'ZMB', 'ZWE'], # Complete region codes here
+    'manifest_id':[f'm{i}' for i in range(1,100)],
+    'SampleRepNo': [f's{i}' for i in range(1,100)],
+}
+
+# frozensets are built once at import so each column check is a single hashed isin
+ALLOWED_SETS = {column: frozenset(allowed) for column, allowed in ALLOWED_VALUES.items()}
+
+# List of age-related columns to check for numeric (float) values
+AGE_COLUMNS = ['age', 'age_of_onset', 'age_at_diagnosis', 'age_at_death', 'age_at_last_follow_up']
+
+BASE_COLUMNS = ['study', 'GP2ID', 'clinical_id', 'GP2sampleID', 'sample_id', 'study_type', 'GP2_phenotype']
+REQUIRED_COLUMNS = BASE_COLUMNS + ['study_arm', 'diagnosis', 'biological_sex_for_qc',
+                                   'race_for_qc', 'family_history_for_qc', 'region_for_qc',
+                                   'manifest_id', 'SampleRepNo', 'Genotyping_site']
+ALL_COLUMNS = REQUIRED_COLUMNS + [
+    "family_index", "family_index_relationship", "sample_type", "DNA_volume",
+    "DNA_conc", "r260_280", "Plate_name", "Plate_position", "race", 'sex',
+    "age", "age_of_onset", "age_at_diagnosis", "age_at_death", "age_at_last_follow_up",
+    "family_history_pd", "family_history_other", "family_history_details", "region",
+    "comment", "alternative_id1", "alternative_id2", 'GP2_phenotype_for_qc', 'filename',
+]
+OPTIONAL_COLUMNS = ["modality"]  # added during processing, not required at submission
+
 
 ##### Sub-functions for the "base_check" function #####
 def check_columns_exist(df, required_columns):
@@ -14,164 +66,296 @@ def check_unexpected_columns(df, expected_columns):
     unexpected_cols = np.setdiff1d(df.columns, expected_columns)
     if unexpected_cols.size > 0:
         raise ValueError(f"Unexpected columns: {unexpected_cols}. Please use the template sheet.")
+def _column_findings(columns):
+    return pd.DataFrame({'column': list(columns), 'value': None, 'index': None})
+
+def find_missing_data(df, required_columns):
+    """
+    Find the missing entries of the required columns.
+
+    Returns:
+    - pd.DataFrame: One row per missing entry with 'column', 'value' (None) and 'index' (row label in df).
+    """
+    found = []
+    for column in required_columns:
+        mask = df[column].isna().to_numpy()
+        if mask.any():
+            found.append(pd.DataFrame({'column': column, 'value': None, 'index': df.index[mask]}))
+    if not found:
+        return pd.DataFrame(columns=['column', 'value', 'index'])
+    return pd.concat(found, ignore_index=True)
+
+def _missing_data_message(found):
+    return f"Missing entries found in required columns: {', '.join(found['column'].unique())}"
+
 def check_missing_data(df, required_columns):
-    """Check for missing data in required columns, list missing columns, and report the first 30 entries with missing data."""
-    df_check = df[required_columns].copy()
-    missing_data_summary = df_check.isna().sum()
-    # Check if there are any missing values at all
-    if missing_data_summary.sum() > 0:
-        # Get columns with missing data
-        missing_columns = missing_data_summary[missing_data_summary > 0].index.tolist()
-        error_msg = (f"Missing entries found in required columns: {', '.join(missing_columns)}")
-        raise ValueError(error_msg)
+    """Check for missing data in required columns and list the columns with missing entries."""
+    found = find_missing_data(df, required_columns)
+    if not found.empty:
+        raise ValueError(_missing_data_message(found))
         
 def check_one_study(df):
     if len(df.study.unique())>1:
         raise ValueError(f"More than one study in the file: {df.study.unique()}")
 
+def find_id_conflicts(df):
+    """
+    Find all sample_id duplicates and GP2ID<->clinical_id conflicts across every study in one pass.
+    Each check keys on (study, id) with hashed duplicated/isin, so the cost is linear in the number of rows.
+
+    Returns:
+    - pd.DataFrame: One row per offending entry with 'check', 'study', 'column', 'value' and 'index' (row label in df).
+    """
+    found = []
+    dup = df.duplicated(subset=['study', 'sample_id'], keep=False)
+    if dup.any():
+        found.append(pd.DataFrame({'check': 'sample_id not unique', 'study': df.loc[dup, 'study'].to_numpy(dtype=object),
+                                   'column': 'sample_id', 'value': df.loc[dup, 'sample_id'].to_numpy(dtype=object),
+                                   'index': df.index[dup]}))
+
+    # distinct (study, GP2ID, clinical_id) triplets; a key appearing in more than one triplet is a conflict
+    pairs = df.loc[~df.duplicated(subset=['study', 'GP2ID', 'clinical_id']), ['study', 'GP2ID', 'clinical_id']]
+    for identifier, related_field in [('GP2ID', 'clinical_id'), ('clinical_id', 'GP2ID')]:
+        conflict = pairs.duplicated(subset=['study', identifier], keep=False)
+        if not conflict.any():
+            continue
+        keys = pd.MultiIndex.from_frame(pairs.loc[conflict, ['study', identifier]])
+        rows = pd.MultiIndex.from_frame(df[['study', identifier]]).isin(keys)
+        found.append(pd.DataFrame({'check': f'{identifier} assigned to different {related_field}',
+                                   'study': df.loc[rows, 'study'].to_numpy(dtype=object),
+                                   'column': identifier, 'value': df.loc[rows, identifier].to_numpy(dtype=object),
+                                   'index': df.index[rows]}))
+
+    if not found:
+        return pd.DataFrame(columns=['check', 'study', 'column', 'value', 'index'])
+    return pd.concat(found, ignore_index=True)
+
+def _id_conflicts_message(found):
+    """One line per study failing any of the checks in found."""
+    errors = []
+    for (check, study), t in found.groupby(['check', 'study'], sort=False):
+        if check == 'sample_id not unique':
+            errors.append(f"In study '{study}', sample_id is not unique: {t['value'].unique().tolist()}")
+        else:
+            identifier = t['column'].iloc[0]
+            errors.append(f"In study '{study}', FAIL: {check}. Issues with {identifier}: {t['value'].unique().tolist()}")
+    return '\n'.join(errors)
+
+def _raise_id_conflicts(found, checks):
+    """Raise one ValueError listing every study failing any of the given checks."""
+    found = found[found['check'].isin(checks)]
+    if not found.empty:
+        raise ValueError(_id_conflicts_message(found))
+
 def check_unique_ids(df):
     """Check if Sample Identities (sample_id) are unique within each study within the dataframe."""
-    grouped = df.groupby('study')
-    for study, group in grouped:
-        if not group['sample_id'].is_unique:
-            duplicates = group.loc[group.duplicated(subset=['sample_id']), 'sample_id'].unique()
-            raise ValueError(f"In study '{study}', sample_id is not unique: {duplicates}")
+    _raise_id_conflicts(find_id_conflicts(df), ['sample_id not unique'])
 
 
-def check_clinical_identity(df, base_cols):
+def check_clinical_identity(df, base_cols=None):
     """Check the uniqueness of clinical identifiers and their correct assignments within each study, raise errors if checks fail."""
-    show_cols = base_cols + ['manifest_id', 'study']
-
-    for study, group in df.groupby('study'):
-        for identifier, related_field in [('GP2ID', 'clinical_id'), ('clinical_id', 'GP2ID')]:
-            dups = group.loc[group[identifier].duplicated(), identifier].unique()
-            if dups.size > 0:
-                details = group.loc[group[identifier].isin(dups), show_cols].copy()
-                grouped_details = details.drop_duplicates(subset=[identifier, related_field]).groupby(identifier).size()
-                problem_ids = list(grouped_details[grouped_details != 1].index)
-                if problem_ids:
-                    error_msg = (
-                        f"In study '{study}', FAIL: {identifier} assigned to different {related_field}. "
-                        f"Issues with {identifier}: {problem_ids}"
-                    )
-                    raise ValueError(error_msg)
+    _raise_id_conflicts(find_id_conflicts(df), ['GP2ID assigned to different clinical_id',
+                                                'clinical_id assigned to different GP2ID'])
+
+def _preview(values, n=30):
+    """Format the first n entries of a list-like for an error message."""
+    values = list(values)
+    return f"{values[:n]}{f' ... {len(values)} in total' if len(values) > n else ''}"
+
+def find_unallowed_values(df):
+    """
+    Find every unallowed value in the enumerated columns and every non-numeric entry in the age columns.
+
+    Returns:
+    - pd.DataFrame: One row per offending entry with 'column', 'value' and 'index' (row label in df).
+    """
+    found = []
+    for column, allowed in ALLOWED_SETS.items():
+        s = df[column]
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            # only the categories need a lookup; rows are matched through the codes
+            bad_values = s.cat.categories[~s.cat.categories.isin(allowed)]
+            mask = s.isin(bad_values)
+        else:
+            mask = s.notna() & ~s.isin(allowed)
+        if mask.any():
+            found.append(pd.DataFrame({'column': column, 'value': s[mask].to_numpy(dtype=object), 'index': s.index[mask]}))
+
+    for col in AGE_COLUMNS:
+        s = df[col]
+        if pd.api.types.is_numeric_dtype(s.dtype):
+            continue  # numpy numeric dtype: every entry is already int/float/NaN
+        mask = s.notna() & pd.to_numeric(s, errors='coerce').isna()
+        if mask.any():
+            found.append(pd.DataFrame({'column': col, 'value': s[mask].to_numpy(dtype=object), 'index': s.index[mask]}))
+        else:
+            # e.g. numbers stored as text: the column itself is the problem
+            found.append(pd.DataFrame({'column': [col], 'value': [str(s.dtype)], 'index': [None]}))
+
+    if not found:
+        return pd.DataFrame(columns=['column', 'value', 'index'])
+    return pd.concat(found, ignore_index=True)
+
+def _unallowed_values_message(found):
+    errors = []
+    for column, t in found.groupby('column', sort=False):
+        if column in AGE_COLUMNS:
+            if t['index'].isna().all():
+                errors.append(f"Column {column} contains non-numeric values.")
+            else:
+                errors.append(f"Non-float values detected in {column}: {t['value'].unique().tolist()} (rows: {_preview(t['index'])})")
+        else:
+            errors.append(f"Unallowed values detected in {column}: {t['value'].unique().tolist()} (rows: {_preview(t['index'])})")
+    return '\n'.join(errors)
 
 def validate_allowed_values(df):
-    """Validate if values in specific columns match the allowed values."""
-    allowed_values = {
-        'GP2_phenotype': ['PD', 'Control', 'Prodromal', 'PSP', 'CBD/CBS', 'MSA', 'DLB', 'LBD',
-                          'AD', 'FTD', "VaD", "VaPD", 'Population Control', 'Undetermined-MCI',
-                          'Undetermined-Dementia', 'Mix', 'Other'],
-        'study_type': ['Case(/Control)', 'Prodromal', 'Genetically Enriched', 'Population Cohort', 'Brain Bank', 'Monogenic'],
-        'biological_sex_for_qc': ['Male', 'Female', 'Other/Unknown/Not Reported'],
-        'race_for_qc': ['American Indian or Alaska Native', 'Asian', 'White',
-                        'Black or African American', 'Hispanic or Latino', 'Multi-racial', 'Native Hawaiian or Other Pacific Islander',
-                        'Other', 'Unknown', 'Not Reported'],
-        'family_history_for_qc': ['Yes', 'No', 'Not Reported', 'Unknown'],
-        # 'family_history_other_for_qc': ['Yes', 'No', 'Not Reported', 'Unknown'],
-        'region_for_qc': ['ABW', 'AFG', 'AGO', 'AIA', 'ALA', 'ALB', 'AND', 'ARE', 'ARG', 'ARM', 'ASM', 'ATA', 'ATF', 'ATG', 'AUS', 'AUT', 'AZE',
-                          'BDI', 'BEL', 'BEN', 'BES', 'BFA', 'BGD', 'BGR', 'BHR', 'BHS', 'BIH', 'BLM', 'BLR', 'BLZ', 'BMU', 'BOL', 'BRA', 'BRB',
-                          'BRN', 'BTN', 'BVT', 'BWA', 'CAF', 'CAN', 'CCK', 'CHE', 'CHL', 'CHN', 'CIV', 'CMR', 'COD', 'COG', 'COK', 'COL', 'COM',
-                          'CPV', 'CRI', 'CUB', 'CUW', 'CXR', 'CYM', 'CYP', 'CZE', 'DEU', 'DJI', 'DMA', 'DNK', 'DOM', 'DZA', 'ECU', 'EGY', 'ERI',
-                          'ESH', 'ESP', 'EST', 'ETH', 'FIN', 'FJI', 'FLK', 'FRA', 'FRO', 'FSM', 'GAB', 'GBR', 'GEO', 'GGY', 'GHA', 'GIB', 'GIN',
-                          'GLP', 'GMB', 'GNB', 'GNQ', 'GRC', 'GRD', 'GRL', 'GTM', 'GUF', 'GUM', 'GUY', 'HKG', 'HMD', 'HND', 'HRV', 'HTI', 'HUN',
-                          'IDN', 'IMN', 'IND', 'IOT', 'IRL', 'IRN', 'IRQ', 'ISL', 'ISR', 'ITA', 'JAM', 'JEY', 'JOR', 'JPN', 'KAZ', 'KEN', 'KGZ',
-                          'KHM', 'KIR', 'KNA', 'KOR', 'KWT', 'LAO', 'LBN', 'LBR', 'LBY', 'LCA', 'LIE', 'LKA', 'LSO', 'LTU', 'LUX', 'LVA', 'MAC',
-                          'MAF', 'MAR', 'MCO', 'MDA', 'MDG', 'MDV', 'MEX', 'MHL', 'MKD', 'MLI', 'MLT', 'MMR', 'MNE', 'MNG', 'MNP', 'MOZ', 'MRT',
-                          'MSR', 'MTQ', 'MUS', 'MWI', 'MYS', 'MYT', 'NAM', 'NCL', 'NER', 'NFK', 'NGA', 'NIC', 'NIU', 'NLD', 'NOR', 'NPL', 'NRU',
-                          'NZL', 'OMN', 'PAK', 'PAN', 'PCN', 'PER', 'PHL', 'PLW', 'PNG', 'POL', 'PRI', 'PRK', 'PRT', 'PRY', 'PSE', 'PYF', 'QAT',
-                          'REU', 'ROU', 'RUS', 'RWA', 'SAU', 'SDN', 'SEN', 'SGP', 'SGS', 'SHN', 'SJM', 'SLB', 'SLE', 'SLV', 'SMR', 'SOM', 'SPM',
-                          'SRB', 'SSD', 'STP', 'SUR', 'SVK', 'SVN', 'SWE', 'SWZ', 'SXM', 'SYC', 'SYR', 'TCA', 'TCD', 'TGO', 'THA', 'TJK', 'TKL',
-                          'TKM', 'TLS', 'TON', 'TTO', 'TUN', 'TUR', 'TUV', 'TWN', 'TZA', 'UGA', 'UKR', 'UMI', 'URY', 'USA', 'UZB', 'VAT', 'VCT',
-                          'VEN', 'VGB', 'VIR', 'VNM', 'VUT', 'WLF', 'WSM', 'YEM', 'ZAF', 'ZMB', 'ZWE'], # Complete region codes here
-        'manifest_id':[f'm{i}' for i in range(1,100)],
-        'SampleRepNo': [f's{i}' for i in range(1,100)],
-    }
-
-    for column, allowed in allowed_values.items():
-        unallowed = df[column].dropna().unique()
-        unallowed = [item for item in unallowed if item not in allowed]
-        if unallowed:
-            raise ValueError(f"Unallowed values detected in {column}: {unallowed}")
-
-
-    # List of age-related columns to check for numeric (float) values
-    age_columns = ['age', 'age_of_onset', 'age_at_diagnosis', 'age_at_death', 'age_at_last_follow_up']
-
-    for col in age_columns:
-        if not pd.api.types.is_numeric_dtype(df[col]):
-            raise ValueError(f"Column {col} contains non-numeric values.")
-
-        # Additionally, check for non-float values in the column
-        non_float_values = df[~df[col].apply(lambda x: isinstance(x, (int, float)) or pd.isna(x))]
-        if not non_float_values.empty:
-            raise ValueError(f"Non-float values detected in {col}: {non_float_values[col].tolist()}")
+    """Validate if values in specific columns match the allowed values. All offending columns are reported at once."""
+    found = find_unallowed_values(df)
+    if not found.empty:
+        raise ValueError(_unallowed_values_message(found))
 
 
-def validate_specific_conditions(df):
+def _rows(df, mask, column):
+    return pd.DataFrame({'column': column, 'value': df.loc[mask, column].to_numpy(dtype=object), 'index': df.index[mask]})
+
+def _rows_in_groups(df, keys, groups, column):
+    """Rows of df whose keys are one of the groups (a Series indexed by the keys)."""
+    mask = pd.MultiIndex.from_frame(df[keys]).isin(groups.index)
+    return _rows(df, mask, column)
+
+def find_condition_violations(df):
+    """
+    Find the violations of the cross-column rules (study_arm/study_type, diagnosis/GP2_phenotype, ...).
+
+    Returns:
+    - list: (check, message, findings, severity) for every rule that fails, in the order base_check applies them.
+    """
+    found = []
     # study_arm should be assigned to one study_type
     dv=df.drop_duplicates(['study', 'study_arm', 'study_type']).groupby(['study', 'study_arm']).size()
     if len(dv[dv>1])>0:
-        raise ValueError('The same study_arm assigned to two or more study_type')
+        found.append(('study_arm with multiple study_type', 'The same study_arm assigned to two or more study_type',
+                      _rows_in_groups(df, ['study', 'study_arm'], dv[dv>1], 'study_arm'), 'error'))
 
     # diagnosis assigned to one GP2_phenotype
     dd=df.drop_duplicates(['study', 'diagnosis', 'GP2_phenotype']).groupby(['study', 'diagnosis']).size()
     if len(dd[dd>1])>0:
-        raise ValueError('The same diagnosis assigned to two or more GP2_phenotype')
+        found.append(('diagnosis with multiple GP2_phenotype', 'The same diagnosis assigned to two or more GP2_phenotype',
+                      _rows_in_groups(df, ['study', 'diagnosis'], dd[dd>1], 'diagnosis'), 'error'))
 
     # study_type=='Monogenic' and GP2_phenotype!=Control, then family_history is required
-    dm = df[(df.study_type=='Monogenic')&(df.GP2_phenotype!='Control')].copy()
-    if not dm.empty:
+    monogenic = (df.study_type=='Monogenic')&(df.GP2_phenotype!='Control')
+    if monogenic.any():
         print("Monogenic study_type deteched. Checking family history completeness...")
-        check_missing_data(dm, ['family_history_for_qc'])
+        missing = find_missing_data(df.loc[monogenic, ['family_history_for_qc']], ['family_history_for_qc'])
+        if not missing.empty:
+            found.append(('Monogenic without family_history_for_qc', _missing_data_message(missing), missing, 'error'))
 
     # GP2_phenotype=='LBD' is allowed only if study_type=='Brain Bank'
-    db = df[(df.study_type!='Brain Bank')&(df.GP2_phenotype=='LBD')].copy()
-    if not db.empty:
-        raise ValueError('LBD is allowed only if study_type=="Brain Bank"')
+    lbd = (df.study_type!='Brain Bank')&(df.GP2_phenotype=='LBD')
+    if lbd.any():
+        found.append(('LBD outside Brain Bank', 'LBD is allowed only if study_type=="Brain Bank"',
+                      _rows(df, lbd, 'GP2_phenotype'), 'error'))
 
     # GP2_phenotype=='Prodromal' is only allowed for study_type=='Prodromal'
-    dnp = df[(df.study_type!='Prodromal')&(df.GP2_phenotype=='Prodromal')].copy()
-    if not dnp.empty:
-        raise ValueError('Prodromal-GP2_phenotype is only allowed for study_type=="Prodromal"')
+    prodromal = (df.study_type!='Prodromal')&(df.GP2_phenotype=='Prodromal')
+    if prodromal.any():
+        found.append(('Prodromal outside Prodromal study_type',
+                      'Prodromal-GP2_phenotype is only allowed for study_type=="Prodromal"',
+                      _rows(df, prodromal, 'GP2_phenotype'), 'error'))
 
     # GP2_phenotype=='Control' needs to be warned if provided in the prodromal cohort
-    dp = df[(df.study_type=='Prodromal')&(df.GP2_phenotype=='Control')].copy()
-    if not dp.empty:
-        print('Control-GP2_phenotype assigned for study_type=="Prodromal". Is it rather "Prodromal"?')
+    control = (df.study_type=='Prodromal')&(df.GP2_phenotype=='Control')
+    if control.any():
+        message = 'Control-GP2_phenotype assigned for study_type=="Prodromal". Is it rather "Prodromal"?'
+        print(message)
+        found.append(('Control in Prodromal study_type', message, _rows(df, control, 'GP2_phenotype'), 'warning'))
+    return found
+
+def validate_specific_conditions(df):
+    for check, message, findings, severity in find_condition_violations(df):
+        if severity == 'error':
+            raise ValueError(message)
+
+
+def collect_base_check(df, master_file=False):
+    """
+    Run every base_check check and collect all problems instead of stopping at the first one.
+    Checks that need a missing column are skipped; the missing column is reported.
+
+    Returns:
+    - ValidationReport: The issues in the order base_check applies the checks.
+    """
+    report = ValidationReport()
+    missing_cols = np.setdiff1d(ALL_COLUMNS, df.columns)
+    if missing_cols.size > 0:
+        report.add('missing columns', f"Missing columns: {missing_cols}. Please use the template sheet.",
+                   _column_findings(missing_cols))
+    unexpected_cols = np.setdiff1d(df.columns, ALL_COLUMNS + OPTIONAL_COLUMNS)
+    if unexpected_cols.size > 0:
+        report.add('unexpected columns', f"Unexpected columns: {unexpected_cols}. Please use the template sheet.",
+                   _column_findings(unexpected_cols))
+
+    def has(columns):
+        return all(column in df.columns for column in columns)
+
+    found = find_missing_data(df, [column for column in REQUIRED_COLUMNS if column in df.columns])
+    if not found.empty:
+        report.add('missing data', _missing_data_message(found), found)
+
+    if not master_file and has(['study']): # skip if master_file
+        studies = df.study.unique()
+        if len(studies) > 1:
+            report.add('more than one study', f"More than one study in the file: {studies}",
+                       pd.DataFrame({'column': 'study', 'value': studies, 'index': None}))
+
+    # sample_id duplicates and GP2ID<->clinical_id conflicts for all studies in one pass
+    if has(['study', 'sample_id', 'GP2ID', 'clinical_id']):
+        id_conflicts = find_id_conflicts(df)
+        for check, checks in [('sample_id not unique', ['sample_id not unique']),
+                              ('GP2ID/clinical_id conflict', ['GP2ID assigned to different clinical_id',
+                                                              'clinical_id assigned to different GP2ID'])]:
+            found = id_conflicts[id_conflicts['check'].isin(checks)]
+            if not found.empty:
+                report.add(check, _id_conflicts_message(found), found)
+
+    found = find_id_format_errors(df)
+    if not found.empty:
+        report.add('malformed IDs', id_format_message(found), found)
+
+    if has(ALLOWED_SETS) and has(AGE_COLUMNS):
+        found = find_unallowed_values(df)
+        if not found.empty:
+            report.add('unallowed values', _unallowed_values_message(found), found)
+
+    if has(['study', 'study_arm', 'study_type', 'diagnosis', 'GP2_phenotype', 'family_history_for_qc']):
+        for check, message, findings, severity in find_condition_violations(df):
+            report.add(check, message, findings, severity)
+    return report
 
 
 ##### This is the main function #####
-def base_check(df, master_file=False):
-    base_cols = ['study', 'GP2ID', 'clinical_id', 'GP2sampleID', 'sample_id', 'study_type', 'GP2_phenotype']
-    required_cols = base_cols + ['study_arm', 'diagnosis', 'biological_sex_for_qc',
-                                 'race_for_qc', 'family_history_for_qc', 'region_for_qc',
-                                 'manifest_id', 'SampleRepNo', 'Genotyping_site']
-    all_cols = required_cols + [
-        "family_index", "family_index_relationship", "sample_type", "DNA_volume",
-        "DNA_conc", "r260_280", "Plate_name", "Plate_position", "race", 'sex',
-        "age", "age_of_onset", "age_at_diagnosis", "age_at_death", "age_at_last_follow_up",
-        "family_history_pd", "family_history_other", "family_history_details", "region",
-        "comment", "alternative_id1", "alternative_id2", 'GP2_phenotype_for_qc', 'filename',
-    ]
-    optional_cols = ["modality"]  # added during processing, not required at submission
-
-    # Perform checks
-    check_columns_exist(df, all_cols)
-    check_unexpected_columns(df, all_cols + optional_cols)
-    check_missing_data(df, required_cols)
-    
-    if not master_file: # skip if master_file
-        check_one_study(df)
-    
-    check_unique_ids(df)
-    check_clinical_identity(df, base_cols)
-    validate_allowed_values(df)
-    validate_specific_conditions(df)
+@stage('base_check')
+def base_check(df, master_file=False, collect_errors=False):
+    """
+    Check the manifest against the template rules.
+
+    Args:
+    - df (pd.DataFrame): Manifest (or combined manifests) to check.
+    - master_file (bool): Skip the one-study check for the master sheet.
+    - collect_errors (bool): Return a ValidationReport with every problem instead of raising at the first one.
+    """
+    report = collect_base_check(df, master_file)
+    if collect_errors:
+        return report
+    report.raise_for_errors()
+    print_base_check_summary(df)
 
+def print_base_check_summary(df):
+    """Print what base_check prints when all checks pass (e.g. after base_check(df, collect_errors=True))."""
     print('> All checks passed!\n')
     print('Study arms and phenotype summaries:\n')
-    print(df.groupby(['study_arm', 'study_type', 'diagnosis', 'GP2_phenotype']).size())
+    print(df.groupby(['study_arm', 'study_type', 'diagnosis', 'GP2_phenotype'], observed=True).size())
     # print comments if multiple diagnosis in the same study_arm
     if df.drop_duplicates(['study_arm', 'diagnosis']).groupby(['study_arm']).size().max()>1:
         print('\n=============== !! WARNING !! ===============\nMultiple diagnoses in the same study_arm')
@@ -0,0 +1,174 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor, wait
+import contextlib
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from typing import NamedTuple
+import pandas as pd
+from .base_check import base_check
+from .blob_service import BlobService
+from .consistency import StudyManifestHandler, original_col_dict
+from .processing import GP2SampleManifesstProcessor
+
+DEFAULT_COLUMNS_TO_CHECK = list(original_col_dict) + ['study_type', 'GP2_phenotype']
+SUMMARY_FILE = 'batch_summary.csv'
+
+
+class BatchJob(NamedTuple):
+    study: str
+    blob: str  # manifest blob name in the bucket, e.g. 'STUDY/STUDY_selfQCV3_20240601.xlsx'
+    mid: str
+
+
+def run_job(job, master_sheet_path, output_dir, columns_to_check=DEFAULT_COLUMNS_TO_CHECK,
+            bucket_name='eu-samplemanifest', master_store_path=None, first_manifest=False):
+    """
+    Run the QC steps of one manifest without prompting:
+    load -> assign_manifest_id -> base_check -> combine -> check_inconsistencies (including the IDSTRACKER check).
+
+    The job runs in its own directory (output_dir/{study}_{mid}), which receives the printed log (log.txt),
+    the files written by the checks (validation_report.*, inconsistency_*.csv, unmatched_ids.csv, ...)
+    and summary.json.
+    The first failing step stops the job. A job whose checks all ran but found inconsistencies
+    with previous manifests gets the status 'inconsistent'.
+
+    Returns:
+        dict: Summary of the job (status, failed step, error, rows, seconds per step).
+    """
+    job = BatchJob(*job)
+    job_dir = os.path.abspath(os.path.join(output_dir, f'{job.study}_{job.mid}'))
+    os.makedirs(job_dir, exist_ok=True)
+    master_sheet_path = os.path.abspath(master_sheet_path)
+    if master_store_path is not None:
+        master_store_path = os.path.abspath(master_store_path)
+
+    summary = {**job._asdict(), 'status': 'passed', 'failed_step': None, 'error': None,
+               'rows': None, 'inconsistency': None, 'output_dir': job_dir}
+    seconds = {}
+    state = {}
+
+    def load():
+        processor = GP2SampleManifesstProcessor(bucket_name)
+        processor.load_blob(job.study, job.blob, raise_error=True)
+        state['processor'] = processor
+        summary['rows'] = len(processor.df)
+
+    def handler():
+        if 'handler' not in state:
+            state['handler'] = StudyManifestHandler(state['processor'], master_sheet_path, bucket_name=bucket_name,
+                                                    master_store_path=master_store_path)
+        return state['handler']
+
+    def check_manifest():
+        report = base_check(state['processor'].df, collect_errors=True)
+        if not report.ok:
+            # every problem of the manifest, not only the first one base_check raises
+            report.to_csv('validation_report.csv')
+            report.to_json('validation_report.json')
+            report.raise_for_errors()
+        state['processor'].basic_check(report=report)  # reuses the report instead of checking again
+
+    def check_inconsistencies():
+        handler().check_inconsistencies(columns_to_check)
+        summary['inconsistency'] = handler().inconsistency
+
+    steps = [
+        ('load', load),
+        ('assign_manifest_id', lambda: state['processor'].assign_manifest_id(job.mid)),
+        ('base_check', check_manifest),
+        ('load_previous_manifests', lambda: handler().load_previous_manifests()),
+        ('combine', lambda: handler().combine_study_manifests(first_manifest=first_manifest)),
+        ('check_inconsistencies', check_inconsistencies),  # ends with check_idstracker on the combined manifests
+    ]
+
+    cwd = os.getcwd()
+    with open(os.path.join(job_dir, 'log.txt'), 'w') as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        os.chdir(job_dir)  # the checks write their reports to the working directory
+        try:
+            for step_name, step in steps:
+                start = time.perf_counter()
+                try:
+                    step()
+                except Exception as e:
+                    summary.update(status='failed', failed_step=step_name, error=f'{type(e).__name__}: {e}')
+                    traceback.print_exc()
+                    break
+                finally:
+                    seconds[step_name] = round(time.perf_counter() - start, 3)
+        finally:
+            os.chdir(cwd)
+    if summary['status'] == 'passed' and summary['inconsistency']:
+        summary['status'] = 'inconsistent'  # all checks ran; see the inconsistency_*.csv reports
+
+    summary['seconds'] = seconds
+    with open(os.path.join(job_dir, 'summary.json'), 'w') as f:
+        json.dump(summary, f, indent=2, default=str)
+    return summary
+
+def run_batch(jobs, master_sheet_path, output_dir, max_workers=None, **kwargs):
+    """
+    Run QC jobs in parallel, one job per process at a time.
+    The manifests are downloaded concurrently in this process and each job starts as soon as its manifest is local,
+    so downloads overlap with the jobs already running.
+
+    Args:
+        jobs (list): BatchJob or (study, blob, mid) tuples.
+        master_sheet_path (str): Path to the master sheet CSV file.
+        output_dir (str): Directory receiving one directory per job and batch_summary.csv.
+        max_workers (int, optional): Number of processes. Defaults to the number of CPUs.
+        **kwargs: Passed to run_job (columns_to_check, bucket_name, master_store_path, first_manifest).
+
+    Returns:
+        pandas.DataFrame: One summary row per job, in the order of jobs.
+    """
+    jobs = [BatchJob(*job) for job in jobs]
+    keys = [(job.study, job.mid) for job in jobs]
+    if len(set(keys)) != len(keys):
+        raise ValueError('Each (study, mid) can be in a batch only once')
+    os.makedirs(output_dir, exist_ok=True)
+    mp_context = multiprocessing.get_context('spawn')
+    with BlobService(kwargs.get('bucket_name', 'eu-samplemanifest')) as blob_service, \
+            ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_context) as executor:
+        # workers are spawned, not forked: they may start while the download threads are running.
+        # The first job downloads its own manifest so that it starts right away.
+        futures = [executor.submit(run_job, job, master_sheet_path, output_dir, **kwargs) for job in jobs[:1]]
+        downloads = blob_service.download([job.blob for job in jobs[1:]])
+        for job, download in zip(jobs[1:], downloads):
+            wait([download])  # a failed download is reported by the job's load step
+            futures.append(executor.submit(run_job, job, master_sheet_path, output_dir, **kwargs))
+        summaries = [future.result() for future in futures]
+
+    summary = pd.DataFrame(summaries)
+    summary['seconds'] = summary['seconds'].apply(json.dumps)
+    summary.to_csv(os.path.join(output_dir, SUMMARY_FILE), index=False)
+    return summary
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the manifest QC non-interactively for a batch of manifests.')
+    parser.add_argument('jobs', help='CSV with study, blob and mid columns (one manifest per row)')
+    parser.add_argument('--master-sheet', required=True, help='master sheet CSV')
+    parser.add_argument('--master-store', help='study-partitioned store of the master sheet (see gp2qc.master_store)')
+    parser.add_argument('--output-dir', default='gp2qc_batch', help='directory for the per-job reports')
+    parser.add_argument('--workers', type=int, help='number of processes (default: number of CPUs)')
+    parser.add_argument('--bucket', default='eu-samplemanifest', help='bucket of the submitted manifests')
+    parser.add_argument('--columns', nargs='+', default=DEFAULT_COLUMNS_TO_CHECK,
+                        help='columns checked for inconsistencies with previous manifests')
+    parser.add_argument('--first-manifest', action='store_true',
+                        help='accept studies without previous manifests instead of failing the job')
+    args = parser.parse_args(argv)
+
+    jobs = pd.read_csv(args.jobs, dtype=str)[list(BatchJob._fields)].itertuples(index=False)
+    summary = run_batch(jobs, args.master_sheet, args.output_dir, max_workers=args.workers,
+                        columns_to_check=args.columns, bucket_name=args.bucket,
+                        master_store_path=args.master_store, first_manifest=args.first_manifest)
+    print(summary[['study', 'mid', 'status', 'failed_step', 'error', 'rows', 'inconsistency']].to_string(index=False))
+    print(f'Reports written to {args.output_dir}')
+    return 0 if (summary['status'] == 'passed').all() else 1
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
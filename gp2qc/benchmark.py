@@ -0,0 +1,255 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import pandas as pd
+from .add_sample_ids import add_sample_ids
+from .base_check import base_check
+from .check_idstracker import check_idstracker
+from .consistency import StudyManifestHandler, find_inconsistencies, find_inconsistency
+from .mapper_cache import load_mapper_frame
+from .processing import GP2SampleManifesstProcessor
+from .remove_sample_ids import remove_sample_ids
+from .schema import apply_schema
+from .storage_backend import LocalBackend
+from .synthetic import SIZES, make_manifests, write_local_fixture
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+# Benchmarks of the QC hot paths on synthetic data, against local files (LocalBackend; no network).
+# python -m gp2qc.benchmark --sizes 10k 100k
+# python -m gp2qc.benchmark --memory --sizes 100k  (exits with 1 if a stage exceeds MEMORY_LIMIT)
+MEMORY_LIMIT = 2.0  # peak memory allowed during a stage, relative to the size of its input
+
+
+def _timed(fn, repeat):
+    """Best wall time of repeat calls, with the printed output suppressed."""
+    best = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+class _ArrowPeak:
+    """
+    Peak bytes allocated from the default Arrow memory pool, above the start, while the block runs. The global pool
+    is not replaced: its high-water mark is exact when the block raises it, and otherwise the allocated bytes are
+    sampled every SAMPLE_SECONDS on a thread (Arrow kernels release the GIL).
+    """
+    SAMPLE_SECONDS = 0.001
+
+    def __enter__(self):
+        self.pool = pa.default_memory_pool()
+        self.start = self.pool.bytes_allocated()
+        self.start_max = self.pool.max_memory()
+        self.sampled = self.start
+        self._done = threading.Event()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        return self
+
+    def _sample(self):
+        while not self._done.wait(self.SAMPLE_SECONDS):
+            self.sampled = max(self.sampled, self.pool.bytes_allocated())
+
+    def __exit__(self, *exc_info):
+        self._done.set()
+        self._sampler.join()
+        self.sampled = max(self.sampled, self.pool.bytes_allocated())
+        max_memory = self.pool.max_memory()
+        self.peak = (max_memory if max_memory > self.start_max else self.sampled) - self.start
+
+def _peak_bytes(fn):
+    """
+    Peak memory allocated while fn runs, with the printed output suppressed: tracemalloc (Python objects and
+    numpy buffers) plus the Arrow memory pool (Arrow-backed strings), which tracemalloc does not see.
+    """
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    tracemalloc.reset_peak()
+    start, _ = tracemalloc.get_traced_memory()
+    arrow = _ArrowPeak() if pa is not None else contextlib.nullcontext()
+    try:
+        with arrow, contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        if started:
+            tracemalloc.stop()
+    return peak - start + (arrow.peak if pa is not None else 0)
+
+@contextlib.contextmanager
+def _isolated(root):
+    """Work in root with cold caches isolated from the user's; the checks write their reports to the working directory."""
+    cwd = os.getcwd()
+    cache_dir = os.environ.get('GP2QC_CACHE_DIR')
+    os.environ['GP2QC_CACHE_DIR'] = os.path.join(root, 'cache')
+    os.chdir(root)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+        if cache_dir is None:
+            os.environ.pop('GP2QC_CACHE_DIR', None)
+        else:
+            os.environ['GP2QC_CACHE_DIR'] = cache_dir
+
+def run_benchmarks(n_rows, repeat=3, workdir=None, study='SYN', error_rate=0.0, inconsistency_rate=0.01):
+    """
+    Time base_check, find_inconsistency, check_idstracker, add_sample_ids and remove_sample_ids
+    on synthetic data of n_rows rows per manifest.
+
+    Args:
+        n_rows (int or str): Rows per manifest, or one of SIZES ('10k', '100k', '1M').
+        repeat (int): Calls per benchmark; the best time is reported.
+        workdir (str, optional): Directory for the local fixture. A temporary directory by default.
+        study (str): Study code of the synthetic data.
+        error_rate (float): Fraction of manifest rows with injected base_check errors. The checks then
+            fail by design; their ValueError is ignored so the time to detect the errors is measured.
+        inconsistency_rate (float): Fraction of resubmitted GP2IDs with an injected inconsistency.
+
+    Returns:
+        pandas.DataFrame: One row per benchmark with 'benchmark', 'rows' and 'seconds'.
+    """
+    n_rows = SIZES.get(n_rows, n_rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = workdir or tmp
+        with _isolated(root):
+            previous, new = write_local_fixture(root, n_rows, study=study, error_rate=error_rate,
+                                                inconsistency_rate=inconsistency_rate, excel=False)
+            new = new.assign(manifest_id='m2', filename=f'{study}_selfQCV3_20240601_m2.csv')
+            df_all = pd.concat([previous, new], ignore_index=True)
+            bucket = LocalBackend(os.path.join(root, 'eu-samplemanifest'))
+            # IDs not yet in the mapper, added and removed again in each round
+            extra, _ = make_manifests(max(n_rows // 10, 1), study=study, seed=1)
+            extra = extra.assign(sample_id='x' + extra['sample_id'],
+                                 GP2sampleID=extra['GP2sampleID'].str.replace('_s1', '_s9', regex=False))
+            extra_ids = extra[['study', 'sample_id', 'GP2sampleID', 'clinical_id']]
+
+            def add_and_remove():
+                add_sample_ids(extra_ids, bucket=bucket)
+                remove_sample_ids(extra_ids['sample_id'].tolist(), study, bucket=bucket)
+
+            def expect_errors(fn):
+                def call():
+                    try:
+                        fn()
+                    except ValueError:
+                        if not error_rate:
+                            raise
+                return call
+
+            results = [
+                ('base_check', len(new), _timed(expect_errors(lambda: base_check(new)), repeat)),
+                ('base_check (collect_errors)', len(new), _timed(lambda: base_check(new, collect_errors=True), repeat)),
+                ('find_inconsistency', len(df_all),
+                 _timed(lambda: find_inconsistency(df_all, 'biological_sex_for_qc'), repeat)),
+                ('check_idstracker (cold)', len(new),
+                 _timed(expect_errors(lambda: check_idstracker(bucket, study, new)), 1)),
+                ('check_idstracker (cached)', len(new),
+                 _timed(expect_errors(lambda: check_idstracker(bucket, study, new)), repeat)),
+                ('add_sample_ids + remove_sample_ids', len(extra_ids), _timed(add_and_remove, repeat)),
+            ]
+    return pd.DataFrame(results, columns=['benchmark', 'rows', 'seconds'])
+
+def run_memory_checks(n_rows, limit=MEMORY_LIMIT, workdir=None, study='SYN', inconsistency_rate=0.01):
+    """
+    Measure the peak memory of the validation and consistency stages on synthetic manifests typed with
+    gp2qc.schema, relative to the size of their input (memory_usage(deep=True) of the frames they get).
+
+    Args:
+        n_rows (int or str): Rows per manifest, or one of SIZES ('10k', '100k', '1M').
+        limit (float): Highest peak/input ratio that passes.
+        workdir (str, optional): Directory for the local fixture. A temporary directory by default.
+        study (str): Study code of the synthetic data.
+        inconsistency_rate (float): Fraction of resubmitted GP2IDs with an injected inconsistency.
+
+    Returns:
+        pandas.DataFrame: One row per stage with 'benchmark', 'rows', 'input_MB', 'peak_MB', 'ratio' and 'passed'.
+    """
+    n_rows = SIZES.get(n_rows, n_rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = workdir or tmp
+        with _isolated(root):
+            _, new = write_local_fixture(root, n_rows, study=study, inconsistency_rate=inconsistency_rate, excel=False)
+            bucket = LocalBackend(os.path.join(root, 'eu-samplemanifest'))
+            processor = GP2SampleManifesstProcessor(bucket.name, storage=bucket)
+            processor.study = study
+            processor.df = apply_schema(new.assign(manifest_id='m2', filename=f'{study}_selfQCV3_20240601_m2.csv'))
+            handler = StudyManifestHandler(processor, os.path.join(root, 'master.csv'), storage=bucket,
+                                           drive=LocalBackend(os.path.join(root, 'drive')))
+            with contextlib.redirect_stdout(io.StringIO()):
+                handler.load_previous_manifests()
+                load_mapper_frame(bucket, studies=[study])  # the mapper is not part of the input; load it beforehand
+            columns = ['biological_sex_for_qc', 'race_for_qc', 'family_history_for_qc', 'region_for_qc',
+                       'study_type', 'GP2_phenotype']
+
+            def size(*dfs):
+                return sum(int(df.memory_usage(index=True, deep=True).sum()) for df in dfs)
+
+            results = [('combine_study_manifests', len(handler.mf) + len(processor.df), size(handler.mf, processor.df),
+                        _peak_bytes(handler.combine_study_manifests))]
+            df_all = handler.df_all
+            results += [
+                ('base_check', len(df_all), size(df_all), _peak_bytes(lambda: base_check(df_all))),
+                ('find_inconsistencies', len(df_all), size(df_all),
+                 _peak_bytes(lambda: find_inconsistencies(df_all, columns, gp2ids=processor.df.GP2ID))),
+                ('check_inconsistencies', len(df_all), size(df_all),
+                 _peak_bytes(lambda: handler.check_inconsistencies(columns))),
+            ]
+    results = pd.DataFrame(results, columns=['benchmark', 'rows', 'input_MB', 'peak_MB'])
+    results['ratio'] = (results['peak_MB'] / results['input_MB']).round(2)
+    results[['input_MB', 'peak_MB']] = (results[['input_MB', 'peak_MB']] / 2**20).round(1)
+    results['passed'] = results['ratio'] <= limit
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the QC functions on synthetic data.')
+    parser.add_argument('--sizes', nargs='+', default=['10k', '100k'], help=f'rows per manifest: {list(SIZES)} or numbers')
+    parser.add_argument('--repeat', type=int, default=3, help='calls per benchmark (best time is reported)')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of rows with injected base_check errors')
+    parser.add_argument('--inconsistency-rate', type=float, default=0.01,
+                        help='fraction of resubmitted GP2IDs with injected inconsistencies')
+    parser.add_argument('--output', help='CSV receiving the results')
+    parser.add_argument('--memory', action='store_true',
+                        help='check the peak memory of the stages instead (fails above --limit x the input size)')
+    parser.add_argument('--limit', type=float, default=MEMORY_LIMIT, help='highest peak/input memory ratio that passes')
+    args = parser.parse_args(argv)
+
+    if args.memory:
+        results = pd.concat([run_memory_checks(SIZES.get(size) or int(size), limit=args.limit).assign(size=size) for size in args.sizes],
+                            ignore_index=True)
+        print(results.to_string(index=False))
+        if args.output:
+            results.to_csv(args.output, index=False)
+        if not results['passed'].all():
+            print(f'FAIL: peak memory above {args.limit}x the input size')
+            sys.exit(1)
+        return
+
+    results = []
+    for size in args.sizes:
+        n_rows = SIZES.get(size) or int(size)
+        print(f'Benchmarking {n_rows} rows...')
+        results.append(run_benchmarks(n_rows, repeat=args.repeat, error_rate=args.error_rate,
+                                      inconsistency_rate=args.inconsistency_rate).assign(size=size))
+    results = pd.concat(results, ignore_index=True)
+    print(results.pivot(index='benchmark', columns='size', values='seconds')[args.sizes].round(3).to_string())
+    if args.output:
+        results.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+from .excel_cache import download_manifest, read_manifest_excel
+from .storage_backend import as_backend
+
+# Listing, downloading and decoding of submitted manifests on a thread pool, so that network requests run
+# while the user picks a file or while other manifests are processed. Decoded frames and downloads go through
+# the local caches of gp2qc.excel_cache, so a prefetched manifest is read from disk by any later reader.
+MAX_WORKERS = 8
+PREFETCH = 2  # newest manifests of a study decoded in the background after listing it
+
+
+def study_prefixes(study):
+    """Prefixes of the submitted manifests of a study: {study}/{study} and, for e.g. PPMI-N, PPMI/PPMI-N."""
+    prefixes = [f'{study}/{study}']
+    if '-' in study:
+        prefixes.append(f"{study.split('-')[0]}/{study}")
+    return prefixes
+
+
+class BlobService:
+    """
+    Thread pool listing, downloading and decoding the submitted manifests of one storage.
+
+    Args:
+        bucket (StorageBackend, Bucket or str): Storage of the submitted manifests.
+        engine (str, optional): pd.read_excel engine (see gp2qc.excel_cache.read_manifest_excel).
+        max_workers (int): Number of requests or decodes running at the same time.
+    """
+
+    def __init__(self, bucket, engine=None, max_workers=MAX_WORKERS):
+        self.backend = as_backend(bucket)
+        self.engine = engine
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='gp2qc-blobs')
+        self._lock = threading.Lock()
+        self._decoding = {}  # (name, generation) -> Future of the decoded frame
+
+    def list_study(self, study):
+        """Return BlobInfo of the submitted manifests of the study; the prefixes are listed concurrently."""
+        listings = [self._executor.submit(self.backend.list, prefix) for prefix in study_prefixes(study)]
+        return [info for listing in listings for info in listing.result()]
+
+    def prefetch(self, infos, n=PREFETCH):
+        """
+        Start decoding the n newest (highest generation) manifests in the background.
+
+        Returns:
+            list: BlobInfo of the manifests being prefetched.
+        """
+        newest = sorted(infos, key=lambda info: info.generation, reverse=True)[:n]
+        for info in newest:
+            self._decode(info)
+        return newest
+
+    def _decode(self, info):
+        key = (info.name, info.generation)
+        with self._lock:
+            future = self._decoding.get(key)
+            if future is None:
+                future = self._executor.submit(read_manifest_excel, self.backend, info, self.engine)
+                self._decoding[key] = future
+        return future
+
+    def read_manifest(self, info):
+        """
+        Return the decoded manifest, waiting for its prefetch if one was started.
+
+        Args:
+            info (BlobInfo or str): The manifest blob or its name.
+        """
+        if isinstance(info, str):
+            info = self._stat(info)
+        future = self._decode(info)
+        try:
+            return future.result()
+        finally:
+            with self._lock:
+                # the frame is handed out once; other finished prefetches are in the decode cache on disk
+                self._decoding = {key: future for key, future in self._decoding.items() if not future.done()}
+
+    def _stat(self, name):
+        info = self.backend.stat(name)
+        if info is None:
+            raise FileNotFoundError(f'{self.backend.uri(name)} not found')
+        return info
+
+    def _download(self, blob):
+        info = self._stat(blob) if isinstance(blob, str) else blob
+        download_manifest(self.backend, info, self.engine)
+        return info
+
+    def download(self, blobs):
+        """
+        Download manifests concurrently into the local cache, where read_manifest_excel (in this or another
+        process) picks them up instead of downloading them again.
+
+        Args:
+            blobs (list): BlobInfo or blob names.
+
+        Returns:
+            list: Futures of the BlobInfo of each downloaded manifest, in the order of blobs. A future raises
+                the error of its download (e.g. FileNotFoundError).
+        """
+        return [self._executor.submit(self._download, blob) for blob in blobs]
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait, cancel_futures=not wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
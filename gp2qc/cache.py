@@ -0,0 +1,19 @@
+import os
+
+
+def get_cache_dir(*parts):
+    """
+    Return (and create) a local cache directory.
+    The root is $GP2QC_CACHE_DIR if set, otherwise ~/.cache/gp2qc.
+    """
+    root = os.environ.get('GP2QC_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'gp2qc'))
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+def write_atomic(path, data):
+    """Write bytes to path through a temporary file so readers never see a partial file."""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
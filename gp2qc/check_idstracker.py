@@ -1,42 +1,35 @@
-import json
-import pandas as pd
-from google.cloud import storage
+from .instrumentation import stage
+from .mapper_cache import load_mapper_frame
+from .mapper_keys import find_unmatched_ids, load_key_index, to_mapper_ids
 
+@stage('check_idstracker')
 def check_idstracker(bucket, study, df):
     """
-    Merge the current manifest (df) with the GP2 ID data from GP2IDSMAPPER.json.
+    Check that every (sample_id, GP2sampleID, clinical_id) of the current manifest (df) is in GP2IDSMAPPER.json.
+    The check is an isin on hashed keys (cached per study, see gp2qc.mapper_keys). Unmatched rows are saved to
+    'unmatched_ids.csv' with the reason (unknown sample_id, GP2sampleID and/or clinical_id mismatch) and
+    the IDs the mapper has for the sample_id.
     """
-    
-    blob_id = bucket.blob('IDSTRACKER/GP2IDSMAPPER.json')
-    masterids = json.loads(blob_id.download_as_text())
 
-    study_k = "PPMI" if study in ["PPMI-N", "PPMI-G"] else study # PPMI-N/G's GP2ID stored as PPMI
-    if study_k not in masterids:
+    index = load_key_index(bucket, study)  # cached; rebuilt only if the mapper changed
+    if index is None:
         raise ValueError(f"The study '{study}' was not found in GP2IDSMAPPER.json.")
-    
-    t = masterids[study_k]
-    
-    keys = list(t.keys())
-    values_split = [value for value in t.values()]
-    GP2sampleIDs = [x[0] for x in values_split]
-    clinical_ids = [x[1] for x in values_split]
-    
-    tt = pd.DataFrame({
-        'sample_id': keys,
-        'GP2sampleID': GP2sampleIDs,
-        'clinical_id': clinical_ids
-    })
-    
-    # modify for PPMI: 1. Consistency check and then prepare both PPMI-N and PPMI-G
-    if study in ["PPMI-N", "PPMI-G"]: # modify GP2ID to match with df
-        tt['GP2sampleID'] = tt['GP2sampleID'].str.replace('PPMI_', f'{study}_')
-        df = df[df.study==study].copy() # only check the current df with the same "PPMI-N/G"
-    
-    testmerge = df.merge(tt, on=['sample_id', 'GP2sampleID', 'clinical_id'], how='left', indicator=True)
-    df_unmatched = testmerge[testmerge['_merge'] == 'left_only']
-    
-    if df_unmatched.empty:
+
+    # PPMI-N and PPMI-G share the PPMI IDs in the mapper
+    if study in ["PPMI-N", "PPMI-G"]:
+        df = df[df.study==study] # only check the current df with the same "PPMI-N/G"
+
+    reasons = find_unmatched_ids(index, to_mapper_ids(df, study))
+
+    if reasons.empty:
         print('> All IDs are consistent with the ID system.')
     else:
-        df_unmatched[['sample_id', 'GP2sampleID', 'clinical_id', 'manifest_id', 'GP2_phenotype']].to_csv('unmatched_ids.csv', index=False)
+        df_unmatched = df.loc[reasons.index, ['sample_id', 'GP2sampleID', 'clinical_id', 'manifest_id', 'GP2_phenotype']]
+        df_unmatched = df_unmatched.assign(reason=reasons)
+        mapper = load_mapper_frame(bucket, studies=[study])
+        mapper = mapper[mapper.sample_id.isin(df_unmatched.sample_id)].drop(columns='study').rename(
+            columns={'GP2sampleID': 'mapper_GP2sampleID', 'clinical_id': 'mapper_clinical_id'})
+        df_unmatched = df_unmatched.merge(mapper, on='sample_id', how='left')
+        df_unmatched.to_csv('unmatched_ids.csv', index=False)
+        print(f'Unmatched IDs:\n{df_unmatched.reason.value_counts().to_string()}')
         raise ValueError("!! Some IDs are not compatible with the ID system!!! > 'unmatched_ids.csv' saved. Please check.")
@@ -1,32 +1,92 @@
 import os
-import glob
 import pandas as pd
 import numpy as np
-from google.cloud import storage
+from .attribute_summary import (ATTRIBUTE_COLUMNS, build_attribute_summary, history, load_attribute_summary,
+                                save_attribute_summary, sort_by_sample_rep_no, to_long)
+from .manifest_catalog import read_manifests
+from .master_store import load_master_sheet
+from .schema import apply_schema
+from .storage_backend import FINALIZED_DIR, as_backend, get_drive
 from .base_check import base_check
+from .corrections import load_corrections
 from .check_idstracker import check_idstracker
+from .instrumentation import stage
 
-#### Sub function to the "check_inconsistencies" function
-def find_inconsistency(df, col_to_check):
-    # Identify GP2IDs with inconsistent values
-    inconsistent_gp2ids = df.groupby('GP2ID')[col_to_check].nunique(dropna=False).fillna('MISSING')
-    inconsistent_gp2ids = inconsistent_gp2ids[inconsistent_gp2ids > 1].index.tolist()
+#### Sub functions to the "check_inconsistencies" function
+@stage('find_inconsistencies')
+def find_inconsistencies(df, columns_to_check, gp2ids=None):
+    """
+    Find GP2IDs with more than one value (NaN counted as a value) in any of the columns to check.
+    All columns are counted in a single groupby over GP2ID and the result is long/sparse,
+    so no per-column pivot over the SampleRepNo columns is materialized.
+
+    Args:
+    - df (pd.DataFrame): Combined manifests with 'GP2ID', 'SampleRepNo' and the columns to check.
+    - columns_to_check (list): Columns to check for inconsistencies.
+    - gp2ids (list-like, optional): Only these GP2IDs are checked. The filter is applied before grouping.
+
+    Returns:
+    - pd.DataFrame: One row per (GP2ID, column, SampleRepNo) of an inconsistent GP2ID with
+      'study', 'GP2ID', 'column', 'SampleRepNo', 'value' and 'replacing_value' (value of the latest SampleRepNo).
+    """
+    columns_to_check = list(columns_to_check)
+    if gp2ids is not None:
+        df = df[df.GP2ID.isin(gp2ids)]
+    t = df[['GP2ID', 'SampleRepNo'] + columns_to_check]
+
+    n_values = t.groupby('GP2ID')[columns_to_check].nunique(dropna=False)
+    rows, cols = np.nonzero(n_values.to_numpy() > 1)
+    flagged = pd.MultiIndex.from_arrays([n_values.index[rows], n_values.columns[cols]])  # (GP2ID, column) pairs
+    if len(flagged) == 0:
+        return pd.DataFrame(columns=['study', 'GP2ID', 'column', 'SampleRepNo', 'value', 'replacing_value'])
+
+    t = t[t.GP2ID.isin(flagged.get_level_values(0))]
+    long = t.melt(id_vars=['GP2ID', 'SampleRepNo'], value_vars=columns_to_check, var_name='column', value_name='value')
+    return _inconsistent_rows(long, flagged)
+
+def _inconsistent_rows(long, flagged):
+    """Rows of the flagged (GP2ID, column) pairs with the value of the latest SampleRepNo as 'replacing_value'."""
+    long = long[pd.MultiIndex.from_frame(long[['GP2ID', 'column']]).isin(flagged)]
 
-    # Filter only those rows with inconsistent GP2IDs
-    t = df[df.GP2ID.isin(inconsistent_gp2ids)][['GP2ID', 'SampleRepNo', col_to_check]].copy()
+    # get the last value (SampleRepNo in numeric order: s2 < s10)
+    long = sort_by_sample_rep_no(long)
+    last = long.drop_duplicates(subset=['GP2ID', 'column'], keep='last').set_index(['GP2ID', 'column'])['value']
+    long = long.join(last.rename('replacing_value'), on=['GP2ID', 'column'])
+    long['study'] = long.GP2ID.str.split('_').str[0]
+    return long[['study', 'GP2ID', 'column', 'SampleRepNo', 'value', 'replacing_value']].reset_index(drop=True)
 
-    # get the last value
-    t_last = t.sort_values('SampleRepNo').drop_duplicates(subset=['GP2ID'], keep='last')
-    t_last['replacing_value'] = t_last[col_to_check]
+def find_inconsistencies_from_summary(summary, df, columns_to_check):
+    """
+    Incremental version of find_inconsistencies: compare a new manifest with the attribute summary of the
+    finalized manifests instead of the combined manifests. Gives the same result as find_inconsistencies on
+    the combined manifests for the GP2IDs of df.
 
-    # pivot the table
-    t_pivot = t.pivot(index='GP2ID', columns='SampleRepNo', values=col_to_check)
+    Args:
+    - summary (pd.DataFrame): Attribute summary (see gp2qc.attribute_summary) of the finalized manifests.
+    - df (pd.DataFrame): New manifest.
+    - columns_to_check (list): Columns to check; they must be in the summary.
+    """
+    columns_to_check = list(columns_to_check)
+    missing = np.setdiff1d(columns_to_check, summary['column'].unique()) if not summary.empty else []
+    if len(missing) > 0:
+        raise ValueError(f'Columns not in the attribute summary: {list(missing)}. Rebuild it with these columns.')
+    previous = history(summary[summary.GP2ID.isin(df.GP2ID) & summary.column.isin(columns_to_check)])
+    previous = previous[~previous.manifest_id.isin(df.manifest_id.unique())]  # re-check of a finalized manifest
+    long = pd.concat([previous, to_long(df, columns_to_check)], ignore_index=True)
+
+    n_values = long.groupby(['GP2ID', 'column'])['value'].nunique(dropna=False)
+    flagged = n_values.index[n_values.to_numpy() > 1]
+    if len(flagged) == 0:
+        return pd.DataFrame(columns=['study', 'GP2ID', 'column', 'SampleRepNo', 'value', 'replacing_value'])
+    return _inconsistent_rows(long, flagged)
+
+def find_inconsistency(df, col_to_check):
+    """Wide view (one column per SampleRepNo) of find_inconsistencies for a single column."""
+    t = find_inconsistencies(df, [col_to_check])
+    t_pivot = t.pivot(index='GP2ID', columns='SampleRepNo', values='value')
     t_pivot.columns = [f"{col_to_check}_{col}" for col in t_pivot.columns]
-    # t_prob = t_pivot[t_pivot.apply(lambda row: len(set(row.dropna())) > 1, axis=1)]
-    t_prob = t_pivot
-    t_prob_process = t_prob.copy() # process changes the row of t_prob so keep the original
-    t_prob = t_prob.reset_index()
-    t_prob = t_prob.merge(t_last[['GP2ID', 'replacing_value']], on='GP2ID', how='left')
+    t_prob = t_pivot.reset_index()
+    t_prob = t_prob.merge(t.drop_duplicates('GP2ID')[['GP2ID', 'replacing_value']], on='GP2ID', how='left')
     t_prob['study'] = t_prob.GP2ID.str.split('_').str[0]
     return t_prob
 
@@ -34,93 +94,115 @@ original_col_dict = {'family_history_for_qc':'family_history_pd', 'region_for_qc
                      'race_for_qc':'race', 'biological_sex_for_qc':'sex'}
 
 class StudyManifestHandler:
-    def __init__(self, processor, master_sheet_path, bucket_name='eu-samplemanifest'):
+    def __init__(self, processor, master_sheet_path, bucket_name='eu-samplemanifest', storage=None, drive=None,
+                 master_store_path=None, corrections_version=None):
         """
         Initialize the handler with the processor instance and the path to the master sheet.
         
         Args:
             processor (object): An instance of a class that contains the study and the manifest data.
-            master_sheet_path (str): Path to the master sheet CSV file.
+            master_sheet_path (str): Path to the master sheet CSV file (or a store built by build_master_store).
             bucket_name (str): Name of the GCS bucket. Defaults to 'eu-samplemanifest'.
+            storage (StorageBackend, optional): Storage holding IDSTRACKER instead of the GCS bucket.
+            drive (StorageBackend, optional): Shared drive with the finalized manifests and tools. Defaults to DRIVE_ROOT.
+            master_store_path (str, optional): Study-partitioned copy of the master sheet, rebuilt when the CSV changes.
+                Only the partitions of the study are read.
+            corrections_version (str, optional): Apply the legacy correction sets up to this version
+                (see gp2qc.corrections). Defaults to the latest version.
         """
         self.processor = processor
         self.study = processor.study  # Study is now retrieved from the processor instance
         self.master_sheet_path = master_sheet_path
+        self.master_store_path = master_store_path
+        self.corrections_version = corrections_version
         self.bucket_name = bucket_name
-        self.storage_client = storage.Client()
-        self.bucket = self.storage_client.get_bucket(bucket_name)
+        self.bucket = as_backend(storage or bucket_name)
+        self.drive = drive or get_drive()
         self.mf = pd.DataFrame()  # Attribute to store the previous manifests
         print('Instance created. \n1. load_previous_manifests()\n2. combine_study_manifests()\n3. check_inconsistencies()')
 
+    def finalized_folder(self):
+        """Folder of the study's finalized manifests on the drive (PPMI-N and PPMI-G share PPMI)."""
+        return f'{FINALIZED_DIR}/PPMI' if self.study in ['PPMI-N', 'PPMI-G'] else f'{FINALIZED_DIR}/{self.study}'
+
+    @stage('load_previous_manifests', frame=lambda args, kwargs, result: args[0].mf)
     def load_previous_manifests(self):
         """
         Loads previous manifests from the master sheet and checks for new manifests in the finalized folder.
         Stores the result in the `self.mf` attribute.
         """
-        try:
-            mf = pd.read_csv(self.master_sheet_path, low_memory=False)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"Master sheet path '{self.master_sheet_path}' not found.")
-        
         if self.study in ['PPMI-N', 'PPMI-G']:
             print(f'For {self.study}, PPMI finalized folder will be searched')
-            mf = mf[mf['study'].isin(['PPMI-N', 'PPMI-G'])]
-            folder_path = f'/content/drive/Shareddrives/EUR_GP2/CIWG/sample_manifest/finalized/PPMI'
+            studies = ['PPMI-N', 'PPMI-G']
         else:
-            mf = mf[mf['study'] == self.study]
-            folder_path = f'/content/drive/Shareddrives/EUR_GP2/CIWG/sample_manifest/finalized/{self.study}'
+            studies = [self.study]
+        folder_path = self.finalized_folder()
+
+        try:
+            mf = load_master_sheet(self.master_sheet_path, studies, store_path=self.master_store_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Master sheet path '{self.master_sheet_path}' not found.")
             
         mid_in_mf = mf['manifest_id'].unique()
 
-        if not os.path.exists(folder_path):
-            raise FileNotFoundError(f"Finalized folder path '{folder_path}' not found. Please create the folder.")
+        if not self.drive.exists(folder_path):
+            raise FileNotFoundError(f"Finalized folder path '{folder_path}' not found in {self.drive}. Please create the folder.")
 
-        files = glob.glob(os.path.join(folder_path, '*.csv'))
+        files = [info for info in self.drive.list(f'{folder_path}/')
+                 if info.name.endswith('.csv') and '/' not in info.name[len(folder_path) + 1:]]
 
         if not files:
             print(f'No manifest files found in {folder_path}')
             self.mf = mf  # Assign the master sheet data to the attribute
             return
 
-        d = pd.DataFrame({'path': files})
+        d = pd.DataFrame({'path': [info.name for info in files], 'info': files})
         d['filename'] = d['path'].apply(lambda x: os.path.basename(x))
         d['mid'] = d['filename'].apply(lambda x: x.replace('.csv', '').split('_')[-1])
 
         if not d['mid'].is_unique:
             raise ValueError('Multiple manifests with the same mid in the finalized folder')
 
-        new_manifest_paths = d[~d['mid'].isin(mid_in_mf)]['path'].tolist()
+        new_manifests = d[~d['mid'].isin(mid_in_mf)]
 
-        if new_manifest_paths:
+        if not new_manifests.empty:
             print('New manifests in finalized folder not yet in the master sheet:')
-            for path_i in new_manifest_paths:
+            for path_i in new_manifests['path']:
                 print(f' Adding: {path_i}')
-                df_i = pd.read_csv(path_i, dtype={"sample_id": 'string', 'clinical_id': 'string'})
-                mf = pd.concat([mf, df_i], ignore_index=True)
+            dfs = read_manifests(self.drive, new_manifests['info'].tolist())
+            mf = apply_schema(pd.concat([mf, *dfs], ignore_index=True))  # categories may differ between manifests
         else:
             print('No new manifest to add from the finalized folder')
         
         if mf.empty:
             print('No manifests found in the master sheet and finalized folder. No consistency check needed.')
         else:
-            print(f'Number of samples from all previous submissions:\n{mf["manifest_id"].value_counts()}')
+            print(f'Number of samples from all previous submissions:\n{mf["manifest_id"].value_counts()[lambda counts: counts > 0]}')
             print('Do combine_study_manifests to combine the current manifest with the previous manifests')
         
             self.mf = mf  # Store the result in the class attribute
 
-    def combine_study_manifests(self):
+    @stage('combine_study_manifests', frame=lambda args, kwargs, result: args[0].df_all)
+    def combine_study_manifests(self, first_manifest=None):
         """
         Combines the current manifest DataFrame from the processor with the previous manifest DataFrame stored in `self.mf`.
+
+        Args:
+            first_manifest (bool, optional): Answer to "Is this the first manifest?" when there are no previous
+                manifests. Asked interactively if None.
         """
-        df = self.processor.df.copy()  # Get the current manifest from the processor instance
+        df = self.processor.df  # Get the current manifest from the processor instance (not modified here)
 
         if self.mf.empty:
             print("Previous manifests (mf) are empty. Forgot to load previous manifests?")
-            proceed = input("Is this the first manifest? (yes/no): ").strip().lower()
+            if first_manifest is None:
+                proceed = input("Is this the first manifest? (yes/no): ").strip().lower()
+            else:
+                proceed = 'yes' if first_manifest else 'no'
             
             if proceed == 'yes':
                 print("Proceeding with the first manifest.")
-                self.df_all = df
+                self.df_all = df.copy(deep=False)
             else:
                 raise ValueError("Please do load_previous_manifests > combine_study_manifests before proceeding.")
         
@@ -131,7 +213,7 @@ class StudyManifestHandler:
             elif len(np.union1d(df.study.unique(), self.mf.study.unique())) > 1:
                 raise ValueError('Different study names detected')
 
-            mids = df.manifest_id.unique()
+            mids = df.manifest_id.unique().tolist()
             
             if len(mids) > 1:
                 raise ValueError(f'More than one mid in the current df: {mids}')
@@ -143,17 +225,18 @@ class StudyManifestHandler:
                 if mid != f'm{mid_no}':
                     raise ValueError(f'manifest_id should be m{mid_no}?')
 
-            print(f'Combined with: {self.mf.manifest_id.unique()}')
-            df_all = pd.concat([self.mf, df], ignore_index=True)
+            print(f'Combined with: {self.mf.manifest_id.unique().tolist()}')
+            df_all = apply_schema(pd.concat([self.mf, df], ignore_index=True))
 
             rm_cols = np.intersect1d(df_all.columns, ['GP2_PHENO', 'GP2_family_id', 'alternative_id3', 'alternative_id4', 'GDPR?'])
-            if len(rm_cols) > 0:
-                df_all = df_all.drop(columns=rm_cols)
+            for col in rm_cols:
+                del df_all[col]  # in place; drop() would copy the combined frame
 
             self.df_all = df_all
             print(f'Combined DataFrame has {df_all.shape[0]} rows and {df_all.shape[1]} columns')
             print('Do check_inconsistencies to check for inconsistencies in the combined DataFrame')
     
+    @stage('check_inconsistencies', frame=lambda args, kwargs, result: args[0].df_all)
     def check_inconsistencies(self, columns_to_check):
         """
         Check for inconsistencies in the provided columns of the combined DataFrame.
@@ -163,68 +246,63 @@ class StudyManifestHandler:
         """
         print('Conduct the basic check first')
         
+        corrections = load_corrections(self.drive, self.corrections_version)  # cached until the files change
+        print(f'Legacy corrections version {corrections.version}')
+
         # GP2sampleIDs to be removed due to the same sample_id (issues before R7)
         GP2sampleID_ignore = [] # initialize
-        GP2sampleID_rm_list_path='/content/drive/Shareddrives/EUR_GP2/CIWG/tools/R7_GP2sampleID_with_same_sample_id.txt'
-        with open(GP2sampleID_rm_list_path, 'r') as f:
-            GP2sampleID_rm_list = [line.strip() for line in f]
-        GP2sampleID_rm = set(self.df_all.GP2sampleID).intersection(GP2sampleID_rm_list)
-        if len(GP2sampleID_rm)>0:
+        # shallow copy: columns below are replaced, never written in place, so the combined data is not copied
+        df_all = self.df_all.copy(deep=False)
+        removed = corrections.removed_rows(df_all)
+        if removed.any():
             # list of GP2ID to resolve
-            GP2ID_to_resolve = self.df_all[self.df_all.GP2sampleID.isin(GP2sampleID_rm)].GP2ID.unique() 
-            print(f'Removed {len(GP2sampleID_rm)} GP2sampleID from df_all (Legacy problem of the same sample_id for different samples)')
-            self.df_all = self.df_all[~self.df_all.GP2sampleID.isin(GP2sampleID_rm)].copy()
+            GP2ID_to_resolve = df_all.GP2ID[removed].unique()
+            print(f'Removed {df_all.GP2sampleID[removed].nunique()} GP2sampleID from df_all (Legacy problem of the same sample_id for different samples)')
+            df_all = df_all[~removed]
+            df_all.index = pd.RangeIndex(len(df_all))
             
             # Additionally get the list of potentially missing GP2sampleID in the system (Lecacy Problem)
             # e.g. s1 was kept in the manifest but IDSTRACKER kept s2 because of the new sample getting s3.
-            GP2sampleID_ignore = self.df_all[self.df_all.GP2ID.isin(GP2ID_to_resolve)].GP2sampleID
+            GP2sampleID_ignore = df_all.GP2sampleID[df_all.GP2ID.isin(GP2ID_to_resolve)]
 
-        # Correct the clinical_id based on the GP2sampleID
-        dfall = self.df_all.copy()
-        clinical_id_corrected_list_path='/content/drive/Shareddrives/EUR_GP2/CIWG/tools/clinical_id_corrected.csv'
-        clinical_id_corrected = pd.read_csv(clinical_id_corrected_list_path)[['GP2sampleID', 'clinical_id']].copy()
-        clinical_id_corrected_indexed = clinical_id_corrected.set_index('GP2sampleID')
-        dfall_indexed = dfall.set_index('GP2sampleID')
-        dfall_indexed.update(clinical_id_corrected_indexed)
-        dfall_updated = dfall_indexed.reset_index()
+        # Correct the clinical_id based on the GP2sampleID; only the affected rows are rewritten
+        clinical_id = corrections.corrected_clinical_id(df_all)
+        if clinical_id is not None:
+            df_all['clinical_id'] = clinical_id
 
-        self.df_all = dfall_updated
+        self.df_all = df_all
 
         if len(np.intersect1d(['PPMI-N', 'PPMI-G'], self.df_all.study.unique()))>0:
             # Need to modify study to overcome the base_check (one study and clinical id check per study)
-            df_all_ppmi = self.df_all.copy()
+            df_all_ppmi = self.df_all.copy(deep=False)  # only the study column is replaced
             df_all_ppmi['study'] = 'PPMI' 
             base_check(df_all_ppmi) # PPMI-N/G assignment inconsistency will be detected here
         else:
             base_check(self.df_all)
             
         self.inconsistency = False  # Flag to indicate if inconsistencies are found
+        # one grouped pass for all columns, limited to the GP2IDs of the current manifest
+        dt_all = find_inconsistencies(self.df_all, columns_to_check, gp2ids=self.processor.df.GP2ID)
+        df_prob_all = self.df_all[self.df_all.GP2ID.isin(dt_all.GP2ID)]
         for col_to_check in columns_to_check:
-            dt_prob = find_inconsistency(self.df_all, col_to_check)
-            # limit to the current df
-            dt_prob = dt_prob[dt_prob.GP2ID.isin(self.processor.df.GP2ID)].copy()
+            dt_prob = dt_all[dt_all.column == col_to_check]
                 
             if len(dt_prob) > 0:
                 file_path = f'inconsistency_{col_to_check}.csv'
                 file_path2 = f'long_inconsistency_{col_to_check}.csv'
-                print(f'FAIL: {col_to_check} {len(dt_prob)} entries are inconsistent --> File saved')
+                print(f'FAIL: {col_to_check} {dt_prob.GP2ID.nunique()} entries are inconsistent --> File saved')
                 dt_prob.to_csv(file_path, index=False)
 
                 # dt_prob_long
                 if col_to_check in original_col_dict.keys():
-                    dt_prob_long = self.df_all[self.df_all.GP2ID.isin(dt_prob.GP2ID)].copy()[[
-                        'GP2sampleID', 'GP2ID', 'sample_id', 'clinical_id', 'manifest_id', 
-                        original_col_dict[col_to_check], col_to_check
-                    ]].sort_values('GP2sampleID').to_csv(file_path2, index=False)
+                    show_cols = [original_col_dict[col_to_check], col_to_check]
                 elif col_to_check in ['study_type', 'GP2_phenotype']:
-                    dt_prob_long = self.df_all[self.df_all.GP2ID.isin(dt_prob.GP2ID)].copy()[[
-                        'GP2sampleID', 'GP2ID', 'sample_id', 'clinical_id', 'manifest_id', 
-                        'study_arm', 'study_type', 'diagnosis', 'GP2_phenotype'
-                    ]].sort_values('GP2sampleID').to_csv(file_path2, index=False)
+                    show_cols = ['study_arm', 'study_type', 'diagnosis', 'GP2_phenotype']
                 else:
-                    dt_prob_long = self.df_all[self.df_all.GP2ID.isin(dt_prob.GP2ID)].copy()[[
-                        'GP2sampleID', 'GP2ID', 'sample_id', 'clinical_id', 'manifest_id', col_to_check
-                    ]].sort_values('GP2sampleID').to_csv(file_path2, index=False)
+                    show_cols = [col_to_check]
+                df_prob_all.loc[df_prob_all.GP2ID.isin(dt_prob.GP2ID), [
+                    'GP2sampleID', 'GP2ID', 'sample_id', 'clinical_id', 'manifest_id'] + show_cols
+                ].sort_values('GP2sampleID').to_csv(file_path2, index=False)
 
                 self.inconsistency = True
             else:
@@ -235,6 +313,51 @@ class StudyManifestHandler:
 
         # IDSTRACKER check
         print("Additionally check the ID consistency with the ID system")
-        check_idstracker(self.bucket, self.study, self.df_all[~self.df_all.GP2sampleID.isin(GP2sampleID_ignore)])
+        if len(GP2sampleID_ignore) > 0:
+            check_idstracker(self.bucket, self.study, self.df_all[~self.df_all.GP2sampleID.isin(GP2sampleID_ignore)])
+        else:
+            check_idstracker(self.bucket, self.study, self.df_all)
 
         
+
+    def materialize_attribute_summary(self, columns=ATTRIBUTE_COLUMNS):
+        """
+        Build the per-GP2ID attribute summary of the previous manifests (load_previous_manifests first) and save it
+        in the finalized folder. save_df_to_gdrive(processor, drive=handler.drive) keeps it up to date afterwards.
+
+        Args:
+            columns (list): Columns summarized. Defaults to clinical_id and the columns checked for inconsistencies.
+        """
+        if self.mf.empty:
+            raise ValueError("No previous manifests. Please do load_previous_manifests first.")
+        summary = build_attribute_summary(self.mf, columns)
+        save_attribute_summary(self.drive, self.finalized_folder(), summary)
+        print(f'Attribute summary of {summary.GP2ID.nunique()} GP2IDs saved in {self.drive.uri(self.finalized_folder())}')
+
+    @stage('check_inconsistencies_incremental', frame=lambda args, kwargs, result: args[0].processor.df)
+    def check_inconsistencies_incremental(self, columns_to_check):
+        """
+        Check the current manifest for inconsistencies with the finalized manifests using the attribute summary,
+        without load_previous_manifests/combine_study_manifests. Writes inconsistency_{col}.csv like check_inconsistencies.
+        The full check_inconsistencies (base_check on the combined manifests, legacy corrections) is still needed
+        before finalizing.
+
+        Args:
+            columns_to_check (list): List of columns to check for inconsistencies.
+        """
+        summary, _ = load_attribute_summary(self.drive, self.finalized_folder())
+        if summary is None:
+            raise FileNotFoundError(f'No attribute summary in {self.drive.uri(self.finalized_folder())}. '
+                                    'Please do load_previous_manifests > materialize_attribute_summary first.')
+        dt_all = find_inconsistencies_from_summary(summary, self.processor.df, columns_to_check)
+        self.inconsistency = False
+        for col_to_check in columns_to_check:
+            dt_prob = dt_all[dt_all.column == col_to_check]
+            if len(dt_prob) > 0:
+                print(f'FAIL: {col_to_check} {dt_prob.GP2ID.nunique()} entries are inconsistent --> File saved')
+                dt_prob.to_csv(f'inconsistency_{col_to_check}.csv', index=False)
+                self.inconsistency = True
+            else:
+                print(f'PASS: {col_to_check}')
+        if not self.inconsistency:
+            print('> No inconsistencies found.')
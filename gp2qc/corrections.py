@@ -0,0 +1,126 @@
+import hashlib
+from io import BytesIO
+import re
+from typing import NamedTuple
+import pandas as pd
+from .schema import READ_DTYPE
+from .storage_backend import TOOLS_DIR
+
+# Registry of the legacy corrections applied by check_inconsistencies:
+# - removed GP2sampleIDs (legacy problem of the same sample_id for different samples before R7)
+# - clinical_id corrections by GP2sampleID
+# The original files in the tools folder are version 0. New fixes go into a new version folder
+# (tools/corrections/<version>/ with REMOVED_FILE and/or CLINICAL_ID_FILE) instead of replacing the files in place;
+# versions are applied in natural order (v2 < v10) and a later clinical_id correction replaces an earlier one.
+LEGACY_REMOVED_PATH = f'{TOOLS_DIR}/R7_GP2sampleID_with_same_sample_id.txt'
+LEGACY_CLINICAL_ID_PATH = f'{TOOLS_DIR}/clinical_id_corrected.csv'
+CORRECTIONS_DIR = f'{TOOLS_DIR}/corrections'
+REMOVED_FILE = 'GP2sampleID_removed.txt'
+CLINICAL_ID_FILE = 'clinical_id_corrected.csv'
+
+# (storage name, path) -> (generation, size, md5 of the content)
+_memory_cache = {}
+# (kind, md5 of the content) -> parsed rule set
+_parsed = {}
+# sources ((path, md5), ...) -> Corrections
+_registries = {}
+
+
+class Corrections(NamedTuple):
+    version: str  # latest version applied ('0' for the legacy files only)
+    removed: frozenset  # GP2sampleIDs to remove
+    clinical_id: pd.Series  # corrected clinical_id indexed by GP2sampleID
+    sources: tuple  # (path, md5) of the files, in the order applied
+
+    def removed_rows(self, df):
+        """Boolean mask of the rows of df with a removed GP2sampleID."""
+        return df['GP2sampleID'].isin(self.removed).to_numpy()
+
+    def corrected_clinical_id(self, df):
+        """
+        The clinical_id column of df with the corrections applied, or None if no row is affected.
+        Only the rows of the corrected GP2sampleIDs are looked up and written.
+        """
+        affected = df['GP2sampleID'].isin(self.clinical_id.index).to_numpy()
+        if not affected.any():
+            return None
+        clinical_id = df['clinical_id'].copy()
+        clinical_id[affected] = df['GP2sampleID'][affected].map(self.clinical_id).to_numpy()
+        return clinical_id
+
+
+def _natural_key(version):
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', version)]
+
+def _parse_removed(data):
+    return frozenset(line.strip() for line in data.decode('utf-8').splitlines() if line.strip())
+
+def _parse_clinical_id(data):
+    corrected = pd.read_csv(BytesIO(data), dtype=READ_DTYPE)[['GP2sampleID', 'clinical_id']]
+    corrected = corrected.dropna().drop_duplicates('GP2sampleID', keep='last')
+    return corrected.set_index('GP2sampleID')['clinical_id']
+
+_PARSERS = {'removed': _parse_removed, 'clinical_id': _parse_clinical_id}
+
+def _load_rule_set(backend, path, kind, info=None):
+    """
+    Return (md5, parsed rules) of one file. The file is read again only if its generation or size changed,
+    and parsed again only if its content changed.
+    """
+    info = info or backend.stat(path)
+    if info is None:
+        raise FileNotFoundError(f'{backend.uri(path)} not found.')
+    key = (backend.name, path)
+    cached = _memory_cache.get(key)
+    if cached is not None and cached[:2] == (info.generation, info.size) and (kind, cached[2]) in _parsed:
+        return cached[2], _parsed[(kind, cached[2])]
+    data = backend.read_bytes(path)
+    md5 = hashlib.md5(data).hexdigest()
+    if (kind, md5) not in _parsed:
+        _parsed[(kind, md5)] = _PARSERS[kind](data)
+    _memory_cache[key] = (info.generation, info.size, md5)
+    return md5, _parsed[(kind, md5)]
+
+def list_versions(drive):
+    """Versions of the correction sets in the drive's corrections folder, in the order they are applied."""
+    versions = {info.name[len(CORRECTIONS_DIR) + 1:].split('/')[0] for info in drive.list(f'{CORRECTIONS_DIR}/')}
+    return sorted(versions, key=_natural_key)
+
+def load_corrections(drive, version=None):
+    """
+    Load the legacy files and the versioned correction sets of the drive, through the in-process cache.
+
+    Args:
+        drive (StorageBackend): Shared drive holding the tools folder.
+        version (str, optional): Apply the sets up to this version only ('0' for the legacy files).
+            Defaults to the latest version.
+
+    Returns:
+        Corrections: The merged rules.
+    """
+    infos = {info.name: info for info in drive.list(f'{CORRECTIONS_DIR}/')}
+    versions = list_versions(drive)
+    if version is not None:
+        version = str(version)
+        if version != '0' and version not in versions:
+            raise ValueError(f'Unknown corrections version {version}. Available: {versions}')
+        versions = [] if version == '0' else versions[:versions.index(version) + 1]
+
+    files = [(LEGACY_REMOVED_PATH, 'removed'), (LEGACY_CLINICAL_ID_PATH, 'clinical_id')]
+    for v in versions:
+        files += [(f'{CORRECTIONS_DIR}/{v}/{REMOVED_FILE}', 'removed'),
+                  (f'{CORRECTIONS_DIR}/{v}/{CLINICAL_ID_FILE}', 'clinical_id')]
+    loaded = []
+    for path, kind in files:
+        if path.startswith(f'{CORRECTIONS_DIR}/') and path not in infos:
+            continue  # a version may hold only one of the files
+        md5, rules = _load_rule_set(drive, path, kind, infos.get(path))
+        loaded.append((path, kind, md5, rules))
+
+    sources = tuple((path, md5) for path, _, md5, _ in loaded)
+    if sources not in _registries:
+        removed = frozenset().union(*[rules for _, kind, _, rules in loaded if kind == 'removed'])
+        clinical_id = pd.concat([rules for _, kind, _, rules in loaded if kind == 'clinical_id'])
+        clinical_id = clinical_id[~clinical_id.index.duplicated(keep='last')]  # later versions win
+        _registries[sources] = Corrections(versions[-1] if versions else '0', removed, clinical_id, sources)
+    return _registries[sources]
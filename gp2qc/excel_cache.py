@@ -0,0 +1,84 @@
+import hashlib
+from io import BytesIO
+import os
+import re
+import pandas as pd
+from .cache import get_cache_dir, write_atomic
+from .instrumentation import record_transfer
+from .schema import READ_DTYPE, SCHEMA_VERSION, apply_schema
+
+try:
+    import python_calamine  # noqa: F401
+    # Rust-based reader, much faster than openpyxl on large sheets; pd.read_excel supports it from pandas 2.2
+    CALAMINE = tuple(map(int, re.match(r'(\d+)\.(\d+)', pd.__version__).groups())) >= (2, 2)
+except ImportError:
+    CALAMINE = False
+DEFAULT_ENGINE = 'calamine' if CALAMINE else None  # None: pandas default (openpyxl)
+
+
+def _engine(engine):
+    return engine or os.environ.get('GP2QC_EXCEL_ENGINE') or DEFAULT_ENGINE
+
+def _decoded_path(storage_name, info, engine):
+    """Cache file of a decoded blob; the blob's md5 (or generation) is part of the name, so any upload misses."""
+    version = info.md5_hash or info.generation
+    key = hashlib.md5(f'{info.name}|{version}|{engine}|{SCHEMA_VERSION}'.encode('utf-8')).hexdigest()
+    return os.path.join(get_cache_dir(storage_name, 'decoded'), f'{key}.pkl')
+
+def _downloaded_path(storage_name, info):
+    """Cache file of a downloaded, not yet decoded blob (see download_manifest)."""
+    key = hashlib.md5(f'{info.name}|{info.generation}'.encode('utf-8')).hexdigest()
+    return os.path.join(get_cache_dir(storage_name, 'downloaded'), f'{key}.xlsx')
+
+def download_manifest(backend, info, engine=None):
+    """
+    Download a submitted manifest into the local cache for a later read_manifest_excel, e.g. in another process.
+    Nothing is downloaded if the manifest is already downloaded or decoded.
+
+    Returns:
+        str or None: Path of the downloaded file, None if the decoded manifest is cached.
+    """
+    if os.path.exists(_decoded_path(backend.name, info, _engine(engine))):
+        return None
+    path = _downloaded_path(backend.name, info)
+    if not os.path.exists(path):
+        write_atomic(path, backend.read_bytes(info.name, generation=info.generation))
+    return path
+
+def read_manifest_excel(backend, info, engine=None):
+    """
+    Read a submitted manifest (.xlsx) through the local decode cache.
+
+    Args:
+        backend (StorageBackend): Storage holding the manifest.
+        info (BlobInfo): The manifest blob, as returned by backend.list.
+        engine (str, optional): pd.read_excel engine. Defaults to calamine when installed with pandas>=2.2 ($GP2QC_EXCEL_ENGINE overrides).
+
+    Returns:
+        pandas.DataFrame: The first sheet, with the dtypes of gp2qc.schema.
+    """
+    engine = _engine(engine)
+    path = _decoded_path(backend.name, info, engine)
+    if os.path.exists(path):
+        df = pd.read_pickle(path)
+        record_transfer(read=os.path.getsize(path))  # decoded frame read from the local cache
+        return df
+
+    downloaded_path = _downloaded_path(backend.name, info)
+    try:
+        with open(downloaded_path, 'rb') as f:
+            content = f.read()
+        record_transfer(read=len(content))
+    except FileNotFoundError:
+        content = backend.read_bytes(info.name, generation=info.generation)
+        downloaded_path = None
+    df = apply_schema(pd.read_excel(BytesIO(content), dtype=READ_DTYPE, engine=engine))
+    buffer = BytesIO()
+    df.to_pickle(buffer)
+    write_atomic(path, buffer.getvalue())
+    if downloaded_path is not None:
+        try:
+            os.remove(downloaded_path)  # the decoded frame is cached from now on
+        except FileNotFoundError:  # removed by another process
+            pass
+    return df
@@ -0,0 +1,33 @@
+import functools
+import threading
+
+# Connection pool of the shared client; sized for the thread pools that list/download blobs concurrently
+POOL_SIZE = 32
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_storage_client():
+    """
+    Return the shared Google Cloud Storage client, created on first use.
+    Credentials are discovered only then, so importing gp2qc works offline.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from google.cloud import storage
+                import requests
+
+                client = storage.Client()
+                # reuse keep-alive connections across threads instead of the default pool of 10
+                adapter = requests.adapters.HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+                client._http.mount('https://', adapter)
+                _client = client
+    return _client
+
+@functools.lru_cache(maxsize=None)
+def get_bucket(bucket_name):
+    """Return a bucket handle on the shared client. No request is made until the bucket is used."""
+    return get_storage_client().bucket(bucket_name)
@@ -1,31 +1,25 @@
-import json
-from google.cloud import storage
-import pandas as pd
+from .storage_backend import as_backend
+from .mapper_cache import load_mapper_frame
 
-# Fixed bucket and storage client
+# Default bucket ($GP2QC_STORAGE_ROOT/<bucket_name> when set); the storage client is created on first use
 bucket_name = 'eu-samplemanifest'
-storage_client = storage.Client()
-bucket = storage_client.get_bucket(bucket_name)
 
-def get_gp2idsmapper():
+def get_gp2idsmapper(studies=None, bucket=None):
     """
     get IDs from GP2IDSMAPPER.json.
     
     Args:
-        df (pandas.DataFrame): DataFrame containing 'study', 'sample_id', 'GP2sampleID', 'clinical_id' columns.
+        studies (list, optional): Only load these studies. PPMI-N/G are loaded as PPMI.
+        bucket (StorageBackend, optional): Storage holding IDSTRACKER. Defaults to the eu-samplemanifest bucket.
+
+    Returns:
+        pandas.DataFrame: DataFrame containing 'study', 'sample_id', 'GP2sampleID', 'clinical_id' columns.
     """
-    # Load the ID data from GP2IDSMAPPER.json
-    blob_id = bucket.blob('IDSTRACKER/GP2IDSMAPPER.json')
+    bucket = as_backend(bucket or bucket_name)
+    # Load the IDs from the columnar snapshot (memory-mapped) or stream them from the JSON files
     try:
-        masterids = json.loads(blob_id.download_as_text())
+        df = load_mapper_frame(bucket, studies=studies)
     except Exception as e:
         print(f"Error loading ID data: {e}")
         return
-    
-    # make the df from masterids
-    df = []
-    for study in masterids:
-        for sample_id in masterids[study]:
-            df.append([study, sample_id, masterids[study][sample_id][0], masterids[study][sample_id][1]])
-    df = pd.DataFrame(df, columns=['study', 'sample_id', 'GP2sampleID', 'clinical_id'])
-    return df
\ No newline at end of file
+    return df
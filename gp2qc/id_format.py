@@ -0,0 +1,87 @@
+import pandas as pd
+from .mapper_cache import SHARED_STUDIES
+
+# Characters allowed in submitted IDs (sample_id, clinical_id): word characters and - / ( ) . : = and inner spaces
+NON_STANDARD_PATTERN = r'[^\w\-/(). :=]|^\s|\s$|[^\x00-\x7F]'
+# GP2ID: {study}_{number}; GP2sampleID: {GP2ID}_{SampleRepNo} with SampleRepNo s{number}
+GP2ID_PATTERN = r'^[^_\s]+_\d+$'
+GP2SAMPLEID_PATTERN = r'^[^_\s]+_\d+_s\d+$'
+
+
+def _as_string(s):
+    """s as a pandas string Series; string columns (e.g. Arrow-backed IDs) are used as they are, without a copy."""
+    return s if isinstance(s.dtype, pd.StringDtype) else s.astype('string')
+
+def _study_prefixes(study):
+    """
+    ID prefixes of a study: '{study}_', and for PPMI also 'PPMI-N_' and 'PPMI-G_', whose rows keep their IDs
+    when they are checked together as PPMI (check_inconsistencies).
+    """
+    studies = [study] + [shared for shared, key in SHARED_STUDIES.items() if key == study]
+    return tuple(f'{s}_' for s in studies)
+
+def _starts_with_study(df, column):
+    """Row-wise df[column].startswith(df.study + '_'), vectorized per study."""
+    s = _as_string(df[column])
+    studies = df['study'].unique()
+    if len(studies) == 1 and pd.notna(studies[0]):
+        return s.str.startswith(_study_prefixes(studies[0])).fillna(False).astype(bool)
+    starts = pd.Series(True, index=df.index)
+    for study, idx in df.groupby('study', sort=False).groups.items():
+        starts[idx] = s[idx].str.startswith(_study_prefixes(study)).fillna(False).to_numpy(dtype=bool)
+    return starts
+
+def find_id_format_errors(df):
+    """
+    Find every malformed ID in one vectorized pass per rule. Only the rules whose columns are in df are applied
+    and missing entries are skipped (they are reported by the missing data check).
+
+    Returns:
+    - pd.DataFrame: One row per offending entry with 'check', 'column', 'value' and 'index' (row label in df).
+    """
+    rules = []
+    for column in ['sample_id', 'clinical_id']:
+        if column in df.columns:
+            s = _as_string(df[column])
+            rules.append(('non-standard characters', column, s.str.contains(NON_STANDARD_PATTERN).fillna(False)))
+    if {'study', 'GP2sampleID'} <= set(df.columns):
+        rules.append(('GP2sampleID does not start with the study name', 'GP2sampleID',
+                      df.GP2sampleID.notna() & ~_starts_with_study(df, 'GP2sampleID')))
+    if 'GP2sampleID' in df.columns:
+        s = _as_string(df['GP2sampleID'])
+        rules.append(('malformed GP2sampleID', 'GP2sampleID', ~s.str.match(GP2SAMPLEID_PATTERN).fillna(True)))
+    if 'GP2ID' in df.columns:
+        s = _as_string(df['GP2ID'])
+        rules.append(('malformed GP2ID', 'GP2ID', ~s.str.match(GP2ID_PATTERN).fillna(True)))
+        if 'study' in df.columns:
+            rules.append(('GP2ID does not start with the study name', 'GP2ID',
+                          df.GP2ID.notna() & ~_starts_with_study(df, 'GP2ID')))
+    if {'GP2ID', 'SampleRepNo', 'GP2sampleID'} <= set(df.columns):
+        expected = _as_string(df['GP2ID']) + '_' + _as_string(df['SampleRepNo'])
+        rules.append(('GP2sampleID is not GP2ID_SampleRepNo', 'GP2sampleID',
+                      (_as_string(df['GP2sampleID']) != expected).fillna(False)))
+
+    found = []
+    for check, column, mask in rules:
+        mask = mask.to_numpy(dtype=bool)
+        if mask.any():
+            found.append(pd.DataFrame({'check': check, 'column': column,
+                                       'value': df.loc[mask, column].to_numpy(dtype=object), 'index': df.index[mask]}))
+    if not found:
+        return pd.DataFrame(columns=['check', 'column', 'value', 'index'])
+    return pd.concat(found, ignore_index=True)
+
+def id_format_message(found, n=30):
+    """One line per failed rule with the first n offending values."""
+    lines = []
+    for check, t in found.groupby('check', sort=False):
+        values = t['value'].tolist()
+        preview = f"{values[:n]}{f' ... {len(values)} in total' if len(values) > n else ''}"
+        lines.append(f"{check}: {preview}")
+    return 'Malformed IDs found:\n' + '\n'.join(lines)
+
+def validate_id_formats(df):
+    """Raise one ValueError listing every malformed ID."""
+    found = find_id_format_errors(df)
+    if not found.empty:
+        raise ValueError(id_format_message(found))
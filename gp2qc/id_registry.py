@@ -0,0 +1,104 @@
+import re
+import pandas as pd
+
+SAMPLE_REP_NO_SUFFIX = re.compile(r'_s\d+$')  # GP2ID is the GP2sampleID without it
+
+
+def gp2id_of(gp2sampleid):
+    return SAMPLE_REP_NO_SUFFIX.sub('', gp2sampleid)
+
+def collision_message(collisions):
+    """
+    Number of colliding rows per reason of find_collisions, separating IDs already in the mapper
+    from new IDs conflicting with the clinical_id of an existing participant.
+    """
+    counts = collisions['reason'].value_counts(sort=False)
+    lines = [f'{reason}: {n}' for reason, n in counts.items()]
+    return f'{len(collisions)} new IDs collide with GP2IDSMAPPER.json:\n' + '\n'.join(lines)
+
+
+class GP2IDRegistry:
+    """
+    In-memory view of GP2IDSMAPPER ({study: {sample_id: [GP2sampleID, clinical_id]}}) with hash indexes per study.
+    The mapper dict itself is the forward (sample_id) index; reverse indexes on GP2sampleID and clinical_id
+    are built lazily per study and kept up to date by bulk_insert. The clinical_id index gives the GP2IDs of
+    each participant, so a new ID giving a known clinical_id another GP2ID is found without scanning the study.
+    """
+    def __init__(self, masterids):
+        self.masterids = masterids
+        self._gp2sampleid_index = {}  # study -> {GP2sampleID: sample_id}
+        self._clinical_id_index = {}  # study -> {clinical_id: {GP2ID, ...}}
+
+    def _build_index(self, study):
+        study_ids = self.masterids.get(study, {})
+        gp2sampleid_index = {}
+        clinical_id_index = {}
+        for sample_id, (gp2sampleid, clinical_id) in study_ids.items():
+            gp2sampleid_index[gp2sampleid] = sample_id
+            clinical_id_index.setdefault(clinical_id, set()).add(gp2id_of(gp2sampleid))
+        self._gp2sampleid_index[study] = gp2sampleid_index
+        self._clinical_id_index[study] = clinical_id_index
+
+    def gp2sampleid_index(self, study):
+        """Return the {GP2sampleID: sample_id} index of the study."""
+        if study not in self._gp2sampleid_index:
+            self._build_index(study)
+        return self._gp2sampleid_index[study]
+
+    def clinical_id_index(self, study):
+        """Return the {clinical_id: {GP2ID, ...}} index of the study."""
+        if study not in self._clinical_id_index:
+            self._build_index(study)
+        return self._clinical_id_index[study]
+
+    def find_collisions(self, df):
+        """
+        Find all rows of df whose sample_id or GP2sampleID already exists in the mapper for their study,
+        or whose clinical_id is already mapped to another GP2ID of the study.
+
+        Args:
+            df (pandas.DataFrame): DataFrame containing 'study', 'sample_id', 'GP2sampleID', 'clinical_id' columns.
+
+        Returns:
+            pandas.DataFrame: The colliding rows with an additional 'reason' column.
+        """
+        collisions = []
+        for study, t in df.groupby('study', sort=False):
+            study_ids = self.masterids.get(study, {})
+            if not study_ids:
+                continue
+            for col, index, reason in [('sample_id', study_ids, 'sample_id already exists'),
+                                       ('GP2sampleID', self.gp2sampleid_index(study), 'GP2sampleID already exists')]:
+                hit = t[col].isin(index)
+                if hit.any():
+                    collisions.append(t.loc[hit, ['study', 'sample_id', 'GP2sampleID', 'clinical_id']].assign(reason=reason))
+            clinical_id_index = self.clinical_id_index(study)
+            other_gp2id = [clinical_id in clinical_id_index and gp2id_of(gp2sampleid) not in clinical_id_index[clinical_id]
+                           for clinical_id, gp2sampleid in zip(t['clinical_id'], t['GP2sampleID'])]
+            if any(other_gp2id):
+                collisions.append(t.loc[other_gp2id, ['study', 'sample_id', 'GP2sampleID', 'clinical_id']].assign(
+                    reason='clinical_id already mapped to a different GP2ID'))
+        if not collisions:
+            return pd.DataFrame(columns=['study', 'sample_id', 'GP2sampleID', 'clinical_id', 'reason'])
+        return pd.concat(collisions)
+
+    def bulk_insert(self, df):
+        """
+        Add all rows of df to the mapper. Nothing is added if any row collides;
+        the ValueError then lists every collision at once.
+        """
+        collisions = self.find_collisions(df)
+        if not collisions.empty:
+            raise ValueError(f"{collision_message(collisions)}\n{collisions.to_string()}")
+
+        for study, t in df.groupby('study', sort=False):
+            sample_ids = t['sample_id'].tolist()
+            gp2sampleids = t['GP2sampleID'].tolist()
+            clinical_ids = t['clinical_id'].tolist()
+            self.masterids.setdefault(study, {}).update(
+                zip(sample_ids, ([g, c] for g, c in zip(gp2sampleids, clinical_ids))))
+            if study in self._gp2sampleid_index:
+                self._gp2sampleid_index[study].update(zip(gp2sampleids, sample_ids))
+                clinical_id_index = self._clinical_id_index[study]
+                for clinical_id, gp2sampleid in zip(clinical_ids, gp2sampleids):
+                    clinical_id_index.setdefault(clinical_id, set()).add(gp2id_of(gp2sampleid))
@@ -0,0 +1,169 @@
+import atexit
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+import pandas as pd
+
+# Opt-in per-stage tracing of the QC steps: wall time, rows and in-memory size of the processed DataFrame,
+# bytes read from and written to storage, and peak memory allocated during the stage (tracemalloc; covers Python
+# and numpy/pandas buffers, not Arrow memory). Transfers are reported by the storage backends and manifest readers
+# through record_transfer and count towards every active stage, including those done on worker threads.
+# Enable with `with tracing('trace.json'):` or by setting $GP2QC_TRACE to the JSON path before importing gp2qc.
+# Disabled stages and transfers cost one flag check.
+_state = {'enabled': False, 'records': [], 'stack': [], 'started_tracemalloc': False}
+_lock = threading.Lock()  # the stack is shared with the threads reporting transfers
+
+
+def _frame_stats(df):
+    if df is None or not hasattr(df, 'memory_usage') or not hasattr(df, 'shape'):
+        return None, None
+    return int(df.shape[0]), int(df.memory_usage(index=True, deep=True).sum())
+
+def record_transfer(read=0, written=0):
+    """Add bytes read from or written to storage to the active stages."""
+    if not _state['enabled']:
+        return
+    with _lock:
+        for record in _state['stack']:
+            record['_read'] += read
+            record['_written'] += written
+
+def _default_frame(args, kwargs, result):
+    """First DataFrame argument, otherwise the result."""
+    for value in list(args) + list(kwargs.values()):
+        if hasattr(value, 'memory_usage') and hasattr(value, 'columns'):
+            return value
+    return result
+
+def stage(name, frame=None):
+    """
+    Decorator recording a traced stage.
+
+    Args:
+        name (str): Stage name in the trace.
+        frame (callable, optional): frame(args, kwargs, result) returning the DataFrame whose rows and size are
+            recorded, e.g. the processor's df for a method. Defaults to the first DataFrame argument or the result.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return fn(*args, **kwargs)
+            record = _enter(name)
+            result = None
+            try:
+                result = fn(*args, **kwargs)
+                return result
+            finally:
+                try:
+                    df = (frame or _default_frame)(args, kwargs, result)
+                except AttributeError:  # e.g. the stage failed before the DataFrame was set
+                    df = None
+                _exit(record, df)
+        return wrapper
+    return decorator
+
+def _enter(name):
+    stack = _state['stack']
+    current, peak = tracemalloc.get_traced_memory()
+    if stack:
+        stack[-1]['_peak'] = max(stack[-1]['_peak'], peak)  # peak of the parent so far, before the reset
+    tracemalloc.reset_peak()
+    record = {'stage': name, 'depth': len(stack), 'parent': stack[-1]['stage'] if stack else None,
+              '_start': time.perf_counter(), '_memory': current, '_peak': 0, '_read': 0, '_written': 0}
+    with _lock:
+        stack.append(record)
+    return record
+
+def _exit(record, df):
+    _, peak = tracemalloc.get_traced_memory()
+    peak = max(peak, record['_peak'])
+    stack = _state['stack']
+    with _lock:
+        stack.pop()
+    if stack:
+        stack[-1]['_peak'] = max(stack[-1]['_peak'], peak)
+    rows, frame_bytes = _frame_stats(df)
+    _state['records'].append({
+        'stage': record['stage'], 'depth': record['depth'], 'parent': record['parent'],
+        'seconds': round(time.perf_counter() - record['_start'], 6), 'rows': rows, 'frame_bytes': frame_bytes,
+        'bytes_read': record['_read'], 'bytes_written': record['_written'], 'peak_bytes': peak - record['_memory'],
+    })
+
+def enable_tracing():
+    """Start recording stages (and tracemalloc if it is not running yet)."""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+        _state['started_tracemalloc'] = True
+    _state['enabled'] = True
+
+def disable_tracing():
+    """Stop recording stages. The recorded trace is kept until clear_trace."""
+    _state['enabled'] = False
+    if _state['started_tracemalloc']:
+        tracemalloc.stop()
+        _state['started_tracemalloc'] = False
+
+def clear_trace():
+    _state['records'].clear()
+
+def get_trace():
+    """Recorded stages in completion order."""
+    return list(_state['records'])
+
+def write_trace(path):
+    """Write the recorded stages as JSON."""
+    with open(path, 'w') as f:
+        json.dump({'stages': get_trace()}, f, indent=2)
+
+def print_trace_summary():
+    """
+    Print one line per stage name: calls, total and max seconds, max rows, max frame size, total bytes read and
+    written, and max peak memory.
+    """
+    records = pd.DataFrame(get_trace(), columns=['stage', 'depth', 'seconds', 'rows', 'frame_bytes', 'bytes_read',
+                                                 'bytes_written', 'peak_bytes'])
+    if records.empty:
+        print('No traced stages.')
+        return
+    summary = records.groupby('stage', sort=False).agg(
+        depth=('depth', 'min'), calls=('seconds', 'size'), total_s=('seconds', 'sum'), max_s=('seconds', 'max'),
+        rows=('rows', 'max'), frame_MB=('frame_bytes', 'max'), read_MB=('bytes_read', 'sum'),
+        written_MB=('bytes_written', 'sum'), peak_MB=('peak_bytes', 'max'))
+    mb_columns = ['frame_MB', 'read_MB', 'written_MB', 'peak_MB']
+    summary[mb_columns] = (summary[mb_columns] / 2**20).round(1)
+    summary.index = ['  ' * depth + name for name, depth in zip(summary.index, summary['depth'])]
+    print(summary.drop(columns='depth').round(3).to_string())
+
+@contextlib.contextmanager
+def tracing(path=None, summary=True):
+    """
+    Trace the QC stages run inside the block.
+
+    Args:
+        path (str, optional): JSON file receiving the trace.
+        summary (bool): Print the summary table at the end.
+    """
+    clear_trace()
+    enable_tracing()
+    try:
+        yield
+    finally:
+        disable_tracing()
+        if path:
+            write_trace(path)
+        if summary:
+            print_trace_summary()
+
+def _trace_from_env():
+    path = os.environ.get('GP2QC_TRACE')
+    if path:
+        enable_tracing()
+        atexit.register(lambda: (write_trace(path), print_trace_summary()))
+
+
+_trace_from_env()
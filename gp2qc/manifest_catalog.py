@@ -0,0 +1,93 @@
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+from io import BytesIO
+import json
+import os
+import pandas as pd
+from .cache import get_cache_dir, write_atomic
+from .instrumentation import record_transfer
+from .schema import READ_DTYPE, SCHEMA_VERSION, apply_schema
+
+# Local catalog of parsed finalized manifests, per storage: catalog.json maps each manifest path to the
+# size/generation/md5 it had when it was parsed, and the parsed frames are pickled under their content hash.
+# A manifest is re-read only if its size or generation changed, and re-parsed only if its content changed.
+CATALOG_FILE = 'catalog.json'
+MAX_WORKERS = 8
+
+
+def _catalog_dir(storage_name):
+    return get_cache_dir(storage_name, 'finalized')
+
+def _load_catalog(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, CATALOG_FILE), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+def _options_key(dtype):
+    return hashlib.md5(json.dumps([dtype, SCHEMA_VERSION], sort_keys=True).encode('utf-8')).hexdigest()[:8]
+
+def _frame_path(cache_dir, md5, options_key):
+    return os.path.join(cache_dir, f'{md5}.{options_key}.pkl')
+
+def _read_pickle(path):
+    """Parsed frame from the catalog; its file size counts as read for the tracing of the stage."""
+    df = pd.read_pickle(path)
+    record_transfer(read=os.path.getsize(path))
+    return df
+
+def _read_manifest(backend, info, entry, cache_dir, dtype, options_key):
+    """Return (frame, catalog entry) of one manifest, from the catalog if it is still current."""
+    if entry and entry['size'] == info.size and entry['generation'] == info.generation:
+        try:
+            return _read_pickle(_frame_path(cache_dir, entry['md5'], options_key)), entry
+        except FileNotFoundError:
+            pass
+    data = backend.read_bytes(info.name)
+    md5 = hashlib.md5(data).hexdigest()
+    entry = {'size': info.size, 'generation': info.generation, 'md5': md5}
+    path = _frame_path(cache_dir, md5, options_key)
+    try:
+        return _read_pickle(path), entry  # touched but unchanged
+    except FileNotFoundError:
+        pass
+    df = apply_schema(pd.read_csv(BytesIO(data), dtype=dtype))
+    buffer = BytesIO()
+    df.to_pickle(buffer)
+    write_atomic(path, buffer.getvalue())
+    return df, entry
+
+def read_manifests(backend, infos, dtype=READ_DTYPE, max_workers=MAX_WORKERS):
+    """
+    Read manifest CSVs concurrently through the local catalog.
+
+    Args:
+        backend (StorageBackend): Storage holding the manifests (e.g. the shared drive).
+        infos (list): BlobInfo of the manifests, as returned by backend.list.
+        dtype (dict, optional): dtype argument of pd.read_csv. Defaults to strings for the IDs.
+        max_workers (int): Number of manifests read at the same time.
+
+    Returns:
+        list: Parsed DataFrames with the dtypes of gp2qc.schema, in the order of infos.
+    """
+    if not infos:
+        return []
+    cache_dir = _catalog_dir(backend.name)
+    catalog = _load_catalog(cache_dir)
+    options_key = _options_key(dtype)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(
+            lambda info: _read_manifest(backend, info, catalog.get(info.name), cache_dir, dtype, options_key), infos))
+
+    catalog = _load_catalog(cache_dir)  # merge with entries written by other sessions meanwhile
+    catalog.update({info.name: entry for info, (_, entry) in zip(infos, results)})
+    write_atomic(os.path.join(cache_dir, CATALOG_FILE), json.dumps(catalog).encode('utf-8'))
+    referenced = {entry['md5'] for entry in catalog.values()}
+    for file_name in os.listdir(cache_dir):
+        if file_name.endswith('.pkl') and file_name.split('.')[0] not in referenced:
+            try:
+                os.remove(os.path.join(cache_dir, file_name))
+            except FileNotFoundError:  # removed by another session
+                pass
+    return [df for df, _ in results]
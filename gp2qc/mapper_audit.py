@@ -0,0 +1,82 @@
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from .id_format import find_id_format_errors
+from .mapper_cache import MAPPER_COLUMNS, load_mapper_frame
+from .storage_backend import as_backend
+
+# Default bucket ($GP2QC_STORAGE_ROOT/<bucket_name> when set)
+bucket_name = 'eu-samplemanifest'
+AUDIT_COLUMNS = ['check'] + MAPPER_COLUMNS
+
+
+def audit_study(study_ids):
+    """
+    Audit the mapper entries of one study.
+
+    Args:
+        study_ids (pandas.DataFrame): Mapper entries of one study with MAPPER_COLUMNS.
+
+    Returns:
+        pandas.DataFrame: One row per offending entry with 'check' and MAPPER_COLUMNS.
+    """
+    study_ids = study_ids.reset_index(drop=True)
+    found = []
+
+    def add(check, mask):
+        if mask.any():
+            found.append(study_ids.loc[mask, MAPPER_COLUMNS].assign(check=check))
+
+    add('duplicate GP2sampleID', study_ids.GP2sampleID.duplicated(keep=False).to_numpy())
+
+    # GP2ID is the GP2sampleID without the SampleRepNo
+    pairs = pd.DataFrame({'GP2ID': study_ids.GP2sampleID.str.replace(r'_s\d+$', '', regex=True),
+                          'clinical_id': study_ids.clinical_id})
+    distinct = pairs.drop_duplicates()
+    for identifier, related_field in [('clinical_id', 'GP2ID'), ('GP2ID', 'clinical_id')]:
+        conflicting = distinct.loc[distinct.duplicated(subset=identifier, keep=False), identifier]
+        add(f'{identifier} mapped to different {related_field}s', pairs[identifier].isin(conflicting).to_numpy())
+
+    # prefix mismatches (GP2sampleID not starting with '{study}_') and malformed IDs
+    format_errors = find_id_format_errors(study_ids)
+    for check, t in format_errors.groupby('check', sort=False):
+        add(check, study_ids.index.isin(t['index']))
+
+    if not found:
+        return pd.DataFrame(columns=AUDIT_COLUMNS)
+    return pd.concat(found, ignore_index=True)[AUDIT_COLUMNS]
+
+def audit_gp2idsmapper(bucket=None, studies=None, max_workers=None, output_path='mapper_audit.csv'):
+    """
+    Audit the whole mapper, one study per process task: duplicate GP2sampleIDs, clinical_ids mapped to
+    conflicting GP2IDs (and vice versa), GP2sampleIDs not starting with '{study}_' and malformed IDs.
+
+    Args:
+        bucket (StorageBackend, optional): Storage holding IDSTRACKER. Defaults to the eu-samplemanifest bucket.
+        studies (list, optional): Only audit these studies.
+        max_workers (int, optional): Number of processes. Defaults to the number of CPUs.
+        output_path (str, optional): CSV receiving the findings if any. None to skip writing.
+
+    Returns:
+        pandas.DataFrame: One row per offending entry with 'check' and MAPPER_COLUMNS.
+    """
+    backend = as_backend(bucket or bucket_name)
+    mapper = load_mapper_frame(backend, studies=studies)  # read once; each task gets only its study
+    study_frames = [t for _, t in mapper.groupby('study', sort=True)]
+    print(f'Auditing {len(mapper)} IDs of {len(study_frames)} studies')
+
+    if max_workers == 1 or len(study_frames) <= 1:
+        results = [audit_study(t) for t in study_frames]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(audit_study, study_frames))
+    results = [t for t in results if not t.empty]
+    if not results:
+        print('> No problems found in GP2IDSMAPPER.')
+        return pd.DataFrame(columns=AUDIT_COLUMNS)
+
+    found = pd.concat(results, ignore_index=True)
+    print(found.groupby(['study', 'check']).size().rename('entries').to_string())
+    if output_path is not None:
+        found.to_csv(output_path, index=False)
+        print(f"> '{output_path}' saved.")
+    return found
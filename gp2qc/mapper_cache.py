@@ -0,0 +1,318 @@
+import glob
+from datetime import datetime
+from io import BytesIO
+import json
+import os
+import random
+import time
+import pandas as pd
+from .cache import get_cache_dir, write_atomic
+from .instrumentation import stage
+from .mapper_shards import MAX_RETRIES, SHARD_INDEX_BLOB, iter_shard_paths, load_shards, update_shards, write_shard
+from .storage_backend import GenerationMismatch, as_backend
+from .mapper_stream import parse_mapper_columns, parse_study_columns
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.feather as feather
+except ImportError:  # the Arrow snapshot is optional; GP2IDSMAPPER.json is used without pyarrow
+    pa = None
+
+MAPPER_BLOB = 'IDSTRACKER/GP2IDSMAPPER.json'
+# Columnar snapshot of the mapper (Arrow IPC, zstd). GP2IDSMAPPER.json is kept next to it as the
+# compatibility export; the snapshot records the JSON generation it was written with.
+MAPPER_SNAPSHOT_BLOB = 'IDSTRACKER/GP2IDSMAPPER.arrow'
+MAPPER_COLUMNS = ['study', 'sample_id', 'GP2sampleID', 'clinical_id']
+# Studies whose IDs are stored under another study in the mapper (their IDs keep their own prefix)
+SHARED_STUDIES = {'PPMI-N': 'PPMI', 'PPMI-G': 'PPMI'}
+
+# (storage name, blob name) -> (generation, masterids)
+_memory_cache = {}
+
+
+def _local_path(storage_name, generation, ext='json'):
+    return os.path.join(get_cache_dir(storage_name, 'IDSTRACKER'), f'GP2IDSMAPPER.{generation}.{ext}')
+
+def _remove_other_generations(path, ext):
+    """Keep only the given generation of a cached file on local disk."""
+    for old_path in glob.glob(os.path.join(os.path.dirname(path), f'GP2IDSMAPPER.*.{ext}')):
+        if old_path != path:
+            os.remove(old_path)
+
+def _store_local(storage_name, generation, text):
+    path = _local_path(storage_name, generation)
+    _remove_other_generations(path, 'json')
+    write_atomic(path, text.encode('utf-8'))
+
+def _store_local_snapshot(storage_name, generation, table):
+    """Cache the snapshot uncompressed so it can be memory-mapped without copying."""
+    path = _local_path(storage_name, generation, 'arrow')
+    _remove_other_generations(path, 'arrow')
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with pa.OSFile(tmp_path, 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+def _local_json_path(backend):
+    """
+    Path of GP2IDSMAPPER.json in the local cache, downloading it only if its generation changed.
+
+    Returns:
+        tuple: (path, generation)
+    """
+    generation = backend.generation(MAPPER_BLOB)  # metadata-only request
+    if generation is None:
+        raise FileNotFoundError(f"{backend.uri(MAPPER_BLOB)} not found.")
+    path = _local_path(backend.name, generation)
+    if not os.path.exists(path):
+        print(f'Downloading GP2IDSMAPPER.json (generation {generation})')
+        data = backend.read_bytes(MAPPER_BLOB, generation=generation)
+        _remove_other_generations(path, 'json')
+        write_atomic(path, data)
+    return path, generation
+
+def _load_json_text(backend):
+    """
+    Read GP2IDSMAPPER.json from the local cache, downloading it only if its generation changed.
+
+    Returns:
+        tuple: (text, generation)
+    """
+    path, generation = _local_json_path(backend)
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read(), generation
+
+def _load_json_masterids(backend, fresh_copy=False):
+    """
+    Load GP2IDSMAPPER.json through the local cache.
+
+    Returns:
+        tuple: (masterids, generation)
+    """
+    key = (backend.name, MAPPER_BLOB)
+    cached = _memory_cache.get(key)
+    if cached is not None and not fresh_copy:
+        if backend.generation(MAPPER_BLOB) == cached[0]:  # metadata-only request
+            return cached[1], cached[0]
+
+    text, generation = _load_json_text(backend)
+    masterids = json.loads(text)
+    if not fresh_copy:
+        _memory_cache[key] = (generation, masterids)
+    return masterids, generation
+
+def load_masterids(bucket, fresh_copy=False, studies=None):
+    """
+    Load the mapper through the local cache, from the per-study shards once the mapper is sharded
+    and from GP2IDSMAPPER.json otherwise. Only metadata is requested; files are downloaded and parsed
+    again only when their generation differs from the cached one.
+
+    Args:
+        bucket (StorageBackend or google.cloud.storage.Bucket): Storage holding IDSTRACKER.
+        fresh_copy (bool): Return a newly parsed dict that the caller may modify.
+            The shared in-memory dict is returned otherwise and must not be modified.
+        studies (list, optional): Only load these studies.
+
+    Returns:
+        dict: {study: {sample_id: [GP2sampleID, clinical_id]}}
+    """
+    backend = as_backend(bucket)
+    if backend.stat(SHARD_INDEX_BLOB) is not None:
+        return load_shards(backend, studies=studies, fresh_copy=fresh_copy)
+    masterids, _ = _load_json_masterids(backend, fresh_copy=fresh_copy)
+    if studies is not None:
+        masterids = {study: masterids[study] for study in studies if study in masterids}
+    return masterids
+
+def masterids_to_table(masterids):
+    """Convert the mapper dict to an Arrow table with MAPPER_COLUMNS."""
+    columns = {col: [] for col in MAPPER_COLUMNS}
+    for study, study_ids in masterids.items():
+        columns['study'].extend([study] * len(study_ids))
+        columns['sample_id'].extend(study_ids.keys())
+        for gp2sampleid, clinical_id in study_ids.values():
+            columns['GP2sampleID'].append(gp2sampleid)
+            columns['clinical_id'].append(clinical_id)
+    return pa.table({col: pa.array(values, type=pa.string()) for col, values in columns.items()})
+
+def save_masterids(bucket, masterids, if_generation_match=None, snapshot_tag=None):
+    """
+    Upload the mapper to GP2IDSMAPPER.json and, with pyarrow, the columnar snapshot.
+    Both are kept as the cached current generation.
+
+    Args:
+        if_generation_match (int, optional): Only overwrite GP2IDSMAPPER.json at this generation.
+        snapshot_tag (dict, optional): Source the snapshot is tagged with. Defaults to the new JSON generation.
+
+    Returns:
+        int: The new generation of GP2IDSMAPPER.json.
+    """
+    backend = as_backend(bucket)
+    text = json.dumps(masterids, indent=4)
+    generation = backend.write_bytes(MAPPER_BLOB, text, if_generation_match=if_generation_match,
+                                     content_type='application/json')
+    _store_local(backend.name, generation, text)
+    _memory_cache[(backend.name, MAPPER_BLOB)] = (generation, masterids)
+
+    if pa is not None:
+        table = masterids_to_table(masterids)
+        sink = BytesIO()
+        feather.write_feather(table, sink, compression='zstd')
+        snapshot_generation = backend.write_bytes(
+            MAPPER_SNAPSHOT_BLOB, sink.getvalue(), metadata=snapshot_tag or {'json_generation': str(generation)},
+            content_type='application/vnd.apache.arrow.file')
+        _store_local_snapshot(backend.name, snapshot_generation, table)
+    return generation
+
+def update_masterids(bucket, studies, update_fn, backup_label):
+    """
+    Apply update_fn(study, study_ids) to the given studies of the mapper with optimistic concurrency.
+    Sharded mapper: only the changed study shards are written (see update_shards); GP2IDSMAPPER.json and the
+    snapshot are not rewritten (see export_gp2idsmapper).
+    GP2IDSMAPPER.json: the whole file is written only if it is still at the generation it was read at;
+    otherwise it is re-read and update_fn applied again.
+
+    Args:
+        bucket (StorageBackend or google.cloud.storage.Bucket): Storage holding IDSTRACKER.
+        studies (list): Studies to update.
+        update_fn (callable): Modifies the {sample_id: [GP2sampleID, clinical_id]} dict of the study in place.
+        backup_label (str): Label of the ARCHIVE copy made before the change, e.g. 'before_add'.
+    """
+    backend = as_backend(bucket)
+    if backend.stat(SHARD_INDEX_BLOB) is not None:
+        update_shards(backend, studies, update_fn, backup_label)
+        return
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    for attempt in range(MAX_RETRIES):
+        masterids, generation = _load_json_masterids(backend, fresh_copy=True)
+        for study in studies:
+            study_ids = masterids.get(study, {})
+            update_fn(study, study_ids)
+            if study_ids or study in masterids:
+                masterids[study] = study_ids
+
+        new_blob_name = f'IDSTRACKER/ARCHIVE/GP2IDSMAPPER_{backup_label}_{timestamp}.json'
+        try:
+            backend.copy(MAPPER_BLOB, new_blob_name, source_generation=generation)
+            print(f"Original GP2IDSMAPPER.json copied to {backend.uri(new_blob_name)}")
+            save_masterids(backend, masterids, if_generation_match=generation)
+            print("Updated GP2IDSMAPPER.json saved successfully.")
+            return
+        except GenerationMismatch:
+            print(f'GP2IDSMAPPER.json was changed by someone else. Retrying on the latest version ({attempt + 1}/{MAX_RETRIES})')
+            time.sleep(random.uniform(0.5, 2) * (attempt + 1))
+    raise RuntimeError(f'Could not update GP2IDSMAPPER.json after {MAX_RETRIES} attempts')
+
+def shard_gp2idsmapper(bucket):
+    """Split GP2IDSMAPPER.json into per-study shards (one-time migration). Existing shards are never overwritten."""
+    backend = as_backend(bucket)
+    if backend.stat(SHARD_INDEX_BLOB) is not None:
+        print('GP2IDSMAPPER is already sharded.')
+        return
+    masterids, _ = _load_json_masterids(backend)
+    for study, study_ids in masterids.items():
+        write_shard(backend, study, study_ids, if_generation_match=0)
+    print(f'{len(masterids)} study shards written.')
+    export_gp2idsmapper(backend)  # the snapshot is now tagged with the shard index
+
+def export_gp2idsmapper(bucket):
+    """
+    Rebuild GP2IDSMAPPER.json and the columnar snapshot from the shards (compatibility export).
+    Run on demand; shard updates do not export. The snapshot is tagged with the shard index generation it was
+    built from. The export is skipped if the shards change while it runs, or if GP2IDSMAPPER.json was replaced
+    by another export in the meantime, so an older export never overwrites a newer one.
+
+    Returns:
+        int or None: The new generation of GP2IDSMAPPER.json, or None if the export was skipped.
+    """
+    backend = as_backend(bucket)
+    index_generation = backend.generation(SHARD_INDEX_BLOB)
+    if index_generation is None:
+        raise ValueError('GP2IDSMAPPER is not sharded. Nothing to export.')
+    json_generation = backend.generation(MAPPER_BLOB) or 0
+    masterids = load_shards(backend)
+    if backend.generation(SHARD_INDEX_BLOB) != index_generation:
+        print('The shards changed during the export. GP2IDSMAPPER.json was not exported.')
+        return None
+    try:
+        generation = save_masterids(backend, masterids, if_generation_match=json_generation,
+                                    snapshot_tag={'index_generation': str(index_generation)})
+    except GenerationMismatch:
+        print('GP2IDSMAPPER.json was exported by someone else in the meantime. Skipped.')
+        return None
+    print(f'GP2IDSMAPPER.json exported from {len(masterids)} study shards.')
+    return generation
+
+def load_mapper_table(bucket):
+    """
+    Load the columnar snapshot of the mapper as a memory-mapped Arrow table.
+
+    Returns:
+        pyarrow.Table or None: None without pyarrow, or if the snapshot is missing or
+        was not written with the current GP2IDSMAPPER.json generation.
+    """
+    if pa is None:
+        return None
+    backend = as_backend(bucket)
+    snapshot = backend.stat(MAPPER_SNAPSHOT_BLOB)  # metadata-only requests
+    if snapshot is None:
+        return None
+    # the snapshot is current only if written from the current shard index (sharded) or JSON generation
+    source = backend.stat(SHARD_INDEX_BLOB)
+    tag = 'index_generation'
+    if source is None:
+        source = backend.stat(MAPPER_BLOB)
+        tag = 'json_generation'
+    if source is None:
+        return None
+    if (snapshot.metadata or {}).get(tag) != str(source.generation):
+        print('GP2IDSMAPPER snapshot is out of date; using the JSON files.')
+        return None
+
+    path = _local_path(backend.name, snapshot.generation, 'arrow')
+    if not os.path.exists(path):
+        print(f'Downloading GP2IDSMAPPER snapshot (generation {snapshot.generation})')
+        content = backend.read_bytes(MAPPER_SNAPSHOT_BLOB, generation=snapshot.generation)
+        _store_local_snapshot(backend.name, snapshot.generation, feather.read_table(BytesIO(content)))
+    return pa.ipc.open_file(pa.memory_map(path)).read_all()
+
+def mapper_study_key(study):
+    """PPMI-N/G's IDs are stored as PPMI in the mapper."""
+    return SHARED_STUDIES.get(study, study)
+
+@stage('load_mapper_frame')
+def load_mapper_frame(bucket, studies=None):
+    """
+    Load the mapper as a DataFrame with MAPPER_COLUMNS, from the snapshot when it is current
+    (Arrow-backed string columns, no per-value Python objects) and otherwise by streaming the
+    JSON files straight into column lists without building the nested dicts.
+
+    Args:
+        bucket (StorageBackend or google.cloud.storage.Bucket): Storage holding IDSTRACKER.
+        studies (list, optional): Only load these studies (PPMI-N/G are loaded as PPMI).
+    """
+    backend = as_backend(bucket)
+    if studies is not None:
+        studies = {mapper_study_key(study) for study in studies}
+    table = load_mapper_table(backend)
+    if table is not None:
+        if studies is not None:
+            table = table.filter(pc.is_in(table['study'], value_set=pa.array(list(studies), type=pa.string())))
+        return table.to_pandas(types_mapper={pa.string(): pd.StringDtype('pyarrow')}.get)
+
+    if backend.stat(SHARD_INDEX_BLOB) is not None:
+        columns = None
+        for study, path in iter_shard_paths(backend, studies):
+            with open(path, 'r', encoding='utf-8') as f:
+                columns = parse_study_columns(f, study, columns)
+        if columns is None:
+            return pd.DataFrame(columns=MAPPER_COLUMNS)
+    else:
+        path, _ = _local_json_path(backend)
+        with open(path, 'r', encoding='utf-8') as f:  # parsed in chunks, never held as a whole
+            columns = parse_mapper_columns(f, studies)
+    return pd.DataFrame(columns, columns=MAPPER_COLUMNS)
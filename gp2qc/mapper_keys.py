@@ -0,0 +1,120 @@
+import glob
+import os
+import re
+from typing import NamedTuple
+import numpy as np
+import pandas as pd
+from .cache import get_cache_dir
+from .mapper_cache import MAPPER_BLOB, load_mapper_frame, mapper_study_key
+from .mapper_shards import SHARD_INDEX_BLOB, shard_blob_name
+from .storage_backend import as_backend
+
+# Per-study index of the mapper's ID keys hashed to uint64 (pandas.util.hash_pandas_object per column), kept in
+# memory and in the local cache next to the mapper files for the mapper generation it was built from. Checking a
+# manifest against the mapper is then an isin on integer hashes. 64-bit collisions are not a practical concern.
+KEY_COLUMNS = ['sample_id', 'GP2sampleID', 'clinical_id']
+REASONS = ['unknown sample_id', 'GP2sampleID mismatch', 'clinical_id mismatch', 'GP2sampleID and clinical_id mismatch']
+
+# (storage name, mapper study) -> (version, StudyKeyIndex)
+_memory_cache = {}
+
+
+class StudyKeyIndex(NamedTuple):
+    sample_ids: np.ndarray  # hash of sample_id
+    gp2sampleids: np.ndarray  # hash of (sample_id, GP2sampleID)
+    clinical_ids: np.ndarray  # hash of (sample_id, clinical_id)
+    triplets: np.ndarray  # hash of (sample_id, GP2sampleID, clinical_id)
+
+
+def hash_key_columns(df):
+    """uint64 hash of each entry of the KEY_COLUMNS; equal for equal strings whatever the string dtype."""
+    return [pd.util.hash_pandas_object(df[column], index=False).to_numpy() for column in KEY_COLUMNS]
+
+def _combine(*hashes):
+    """Order-dependent combination of per-column hashes into one hash per row."""
+    combined = hashes[0]
+    for h in hashes[1:]:
+        combined = (combined * np.uint64(1000003)) ^ h  # wraps around modulo 2**64
+    return combined
+
+def _key_hashes(sample_id, gp2sampleid, clinical_id):
+    """Hashes of sample_id, (sample_id, GP2sampleID), (sample_id, clinical_id) and the triplet, as in StudyKeyIndex."""
+    return (sample_id, _combine(sample_id, gp2sampleid), _combine(sample_id, clinical_id),
+            _combine(sample_id, gp2sampleid, clinical_id))
+
+def build_key_index(ids):
+    """StudyKeyIndex of mapper entries with KEY_COLUMNS."""
+    return StudyKeyIndex(*(np.unique(h) for h in _key_hashes(*hash_key_columns(ids))))
+
+def _mapper_version(backend, study):
+    """Generation of the mapper file holding the study (metadata-only requests), or None if there is none."""
+    if backend.stat(SHARD_INDEX_BLOB) is not None:
+        generation = backend.generation(shard_blob_name(study))
+        return None if generation is None else f'shard{generation}'
+    generation = backend.generation(MAPPER_BLOB)
+    return None if generation is None else f'json{generation}'
+
+def _local_path(storage_name, study, version):
+    return os.path.join(get_cache_dir(storage_name, 'IDSTRACKER', 'KEYS'), f'{study}.{version}.npz')
+
+def load_key_index(bucket, study):
+    """
+    Load the hashed key index of a study (PPMI-N/G use PPMI's), rebuilt only when the mapper changed.
+
+    Returns:
+        StudyKeyIndex or None: None if the study is not in the mapper.
+    """
+    backend = as_backend(bucket)
+    study = mapper_study_key(study)
+    version = _mapper_version(backend, study)
+    if version is None:
+        return None
+    key = (backend.name, study)
+    cached = _memory_cache.get(key)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    path = _local_path(backend.name, study, version)
+    if os.path.exists(path):
+        with np.load(path) as arrays:
+            index = StudyKeyIndex(**{field: arrays[field] for field in StudyKeyIndex._fields})
+    else:
+        ids = load_mapper_frame(backend, studies=[study])
+        if ids.empty:
+            return None
+        index = build_key_index(ids)
+        for old_path in glob.glob(os.path.join(os.path.dirname(path), f'{glob.escape(study)}.*.npz')):
+            os.remove(old_path)
+        tmp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(tmp_path, **index._asdict())
+        os.replace(tmp_path, path)
+    _memory_cache[key] = (version, index)
+    return index
+
+def to_mapper_ids(df, study):
+    """df with its KEY_COLUMNS as stored in the mapper: PPMI-N/G GP2sampleIDs are stored as PPMI_..."""
+    if mapper_study_key(study) == study:
+        return df
+    return df[KEY_COLUMNS].assign(
+        GP2sampleID=df['GP2sampleID'].str.replace(f'^{re.escape(study)}_', 'PPMI_', regex=True))
+
+def find_unmatched_ids(index, ids):
+    """
+    Match ID rows against the index.
+
+    Args:
+        index (StudyKeyIndex): Index of the study.
+        ids (pd.DataFrame): With the KEY_COLUMNS as stored in the mapper (see to_mapper_ids).
+
+    Returns:
+        pd.Series: Reason (one of REASONS) for each row of ids without an identical mapper entry, indexed like ids.
+    """
+    sample_id, gp2sampleid, clinical_id = hash_key_columns(ids)
+    unmatched = ~np.isin(_combine(sample_id, gp2sampleid, clinical_id), index.triplets)
+    hashes = _key_hashes(sample_id[unmatched], gp2sampleid[unmatched], clinical_id[unmatched])
+    known = np.isin(hashes[0], index.sample_ids)
+    gp2sampleid_ok = np.isin(hashes[1], index.gp2sampleids)
+    clinical_id_ok = np.isin(hashes[2], index.clinical_ids)
+    reasons = np.select([~known, ~gp2sampleid_ok & ~clinical_id_ok, ~gp2sampleid_ok],
+                        [REASONS[0], REASONS[3], REASONS[1]], default=REASONS[2])
+    return pd.Series(reasons, index=ids.index[unmatched], dtype=object, name='reason')
@@ -0,0 +1,188 @@
+import glob
+import json
+import os
+import random
+import time
+from datetime import datetime
+from .cache import get_cache_dir, write_atomic
+from .storage_backend import GenerationMismatch, as_backend
+
+# Per-study shards of GP2IDSMAPPER: IDSTRACKER/SHARDS/{study}.json holds {sample_id: [GP2sampleID, clinical_id]}
+# and IDSTRACKER/SHARDS/index.json holds {study: shard generation}. The index marks the sharded layout as active.
+SHARD_PREFIX = 'IDSTRACKER/SHARDS/'
+SHARD_INDEX_BLOB = f'{SHARD_PREFIX}index.json'
+MAX_RETRIES = 5
+
+# (storage name, blob name) -> (generation, study_ids)
+_memory_cache = {}
+
+
+def shard_blob_name(study):
+    return f'{SHARD_PREFIX}{study}.json'
+
+def is_sharded(bucket):
+    """Return True if the mapper has been split into per-study shards."""
+    return as_backend(bucket).stat(SHARD_INDEX_BLOB) is not None
+
+def _local_path(storage_name, study, generation):
+    return os.path.join(get_cache_dir(storage_name, 'IDSTRACKER', 'SHARDS'), f'{study}.{generation}.json')
+
+def _store_local(storage_name, study, generation, text):
+    path = _local_path(storage_name, study, generation)
+    for old_path in glob.glob(os.path.join(os.path.dirname(path), f'{glob.escape(study)}.*.json')):
+        if old_path != path:
+            os.remove(old_path)
+    write_atomic(path, text.encode('utf-8'))
+
+def _local_shard_path(backend, study, generation):
+    """Path of one shard in the local cache, downloading it only if its generation changed."""
+    path = _local_path(backend.name, study, generation)
+    if not os.path.exists(path):
+        text = backend.read_bytes(shard_blob_name(study), generation=generation).decode('utf-8')
+        _store_local(backend.name, study, generation, text)
+    return path
+
+def _read_shard_text(backend, study, generation):
+    """Read one shard from the local cache, downloading it only if its generation changed."""
+    with open(_local_shard_path(backend, study, generation), 'r', encoding='utf-8') as f:
+        return f.read()
+
+def _read_shard(backend, study, generation=None, fresh_copy=False):
+    """
+    Read one shard through the local cache.
+
+    Returns:
+        tuple: (study_ids, generation). ({}, 0) if the shard does not exist yet.
+    """
+    name = shard_blob_name(study)
+    if generation is None:
+        generation = backend.generation(name)  # metadata-only request
+    if generation is None:
+        return {}, 0
+    key = (backend.name, name)
+
+    cached = _memory_cache.get(key)
+    if cached is not None and cached[0] == generation and not fresh_copy:
+        return cached[1], generation
+
+    study_ids = json.loads(_read_shard_text(backend, study, generation))
+    if not fresh_copy:
+        _memory_cache[key] = (generation, study_ids)
+    return study_ids, generation
+
+def _shard_generations(backend, studies=None):
+    """Yield (study, generation) of existing shards. Without a study filter one listing request gives all generations."""
+    if studies is None:
+        for info in backend.list(SHARD_PREFIX):
+            if info.name != SHARD_INDEX_BLOB and '/' not in info.name[len(SHARD_PREFIX):]:
+                yield info.name[len(SHARD_PREFIX):-len('.json')], info.generation
+    else:
+        for study in studies:
+            generation = backend.generation(shard_blob_name(study))
+            if generation is not None:
+                yield study, generation
+
+def iter_shard_paths(bucket, studies=None):
+    """Yield (study, path of the shard in the local cache); shards are downloaded only when their generation changed."""
+    backend = as_backend(bucket)
+    for study, generation in _shard_generations(backend, studies):
+        yield study, _local_shard_path(backend, study, generation)
+
+def load_shard_index(bucket):
+    """
+    Returns:
+        tuple: ({study: shard generation}, index generation). ({}, 0) if the mapper is not sharded.
+    """
+    backend = as_backend(bucket)
+    generation = backend.generation(SHARD_INDEX_BLOB)
+    if generation is None:
+        return {}, 0
+    return json.loads(backend.read_bytes(SHARD_INDEX_BLOB, generation=generation)), generation
+
+def load_shards(bucket, studies=None, fresh_copy=False):
+    """
+    Load shards as a mapper dict {study: {sample_id: [GP2sampleID, clinical_id]}}.
+    Unchanged shards are served from the local cache.
+    """
+    backend = as_backend(bucket)
+    return {study: _read_shard(backend, study, generation=generation, fresh_copy=fresh_copy)[0]
+            for study, generation in _shard_generations(backend, studies)}
+
+def _update_index(backend, study, generation):
+    """Record the new generation of a shard in the index, retrying on concurrent index updates."""
+    for attempt in range(MAX_RETRIES):
+        try:
+            index, index_generation = load_shard_index(backend)
+            index[study] = generation
+            backend.write_bytes(SHARD_INDEX_BLOB, json.dumps(index, indent=4, sort_keys=True),
+                                if_generation_match=index_generation, content_type='application/json')
+            return
+        except GenerationMismatch:
+            time.sleep(random.uniform(0.1, 0.5) * (attempt + 1))
+    raise RuntimeError(f'Could not update {SHARD_INDEX_BLOB} after {MAX_RETRIES} attempts')
+
+def write_shard(bucket, study, study_ids, if_generation_match):
+    """
+    Upload one shard only if it is still at the generation it was read at (0: must not exist yet).
+    Raises GenerationMismatch if someone else changed it in between.
+
+    Returns:
+        int: The new generation of the shard.
+    """
+    backend = as_backend(bucket)
+    text = json.dumps(study_ids, indent=4)
+    generation = backend.write_bytes(shard_blob_name(study), text, if_generation_match=if_generation_match,
+                                     content_type='application/json')
+    _store_local(backend.name, study, generation, text)
+    _memory_cache[(backend.name, shard_blob_name(study))] = (generation, study_ids)
+    _update_index(backend, study, generation)
+    return generation
+
+def update_shards(bucket, studies, update_fn, backup_label):
+    """
+    Apply update_fn(study, study_ids) to fresh copies of the shards of all studies, then write back only the shards
+    that changed. Nothing is written unless update_fn succeeds on every study. A shard changed by someone else
+    in between is re-read and update_fn is applied again to the latest version (the retry is the merge),
+    so concurrent writers never overwrite each other.
+
+    Args:
+        bucket (StorageBackend or google.cloud.storage.Bucket): Storage holding IDSTRACKER.
+        studies (list): Studies to update.
+        update_fn (callable): Modifies the {sample_id: [GP2sampleID, clinical_id]} dict of the study in place.
+            Errors raised by update_fn are not retried.
+        backup_label (str): Label of the ARCHIVE copy of each shard before the change, e.g. 'before_add'.
+
+    Returns:
+        list: Studies whose shards were written.
+    """
+    backend = as_backend(bucket)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+    written = []
+    pending = list(studies)
+    for attempt in range(MAX_RETRIES):
+        updates = []
+        for study in pending:
+            study_ids, generation = _read_shard(backend, study, fresh_copy=True)
+            before = dict(study_ids)
+            update_fn(study, study_ids)
+            if study_ids == before:
+                print(f'No change for {study}.')
+            else:
+                updates.append((study, study_ids, generation))
+
+        try:
+            for study, study_ids, generation in updates:
+                if generation:
+                    backup_name = f'IDSTRACKER/ARCHIVE/SHARDS/{study}_{backup_label}_{timestamp}.json'
+                    backend.copy(shard_blob_name(study), backup_name, source_generation=generation)
+                    print(f"Original {study} shard copied to {backend.uri(backup_name)}")
+                write_shard(backend, study, study_ids, if_generation_match=generation)
+                written.append(study)
+                print(f"Updated {study} shard saved successfully.")
+            return written
+        except GenerationMismatch:
+            # shards written in this attempt are kept; the rest is re-read and update_fn applied again
+            pending = [study for study, _, _ in updates if study not in written]
+            print(f'{pending[0]} shard was changed by someone else. Retrying on the latest version ({attempt + 1}/{MAX_RETRIES})')
+            time.sleep(random.uniform(0.5, 2) * (attempt + 1))
+    raise RuntimeError(f'Could not update the {pending[0]} shard after {MAX_RETRIES} attempts')
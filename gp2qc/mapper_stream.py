@@ -0,0 +1,165 @@
+import io
+import json
+from json.decoder import scanstring
+import re
+
+_WS = re.compile(r'[ \t\n\r]*')
+# One {sample_id: [GP2sampleID, clinical_id]} entry with plain (unescaped) strings, followed by ',' or '}'.
+# Other entries (escapes, null/NaN values) go through the JSON decoder.
+_ENTRY = re.compile(r'"([^"\\]*)"[ \t\n\r]*:[ \t\n\r]*\[[ \t\n\r]*"([^"\\]*)"[ \t\n\r]*,[ \t\n\r]*"([^"\\]*)"'
+                    r'[ \t\n\r]*\][ \t\n\r]*(?=[,}])')
+CHUNK_SIZE = 1 << 20  # characters read from the file at a time
+MAX_VALUE_SIZE = 1 << 24  # longest key or entry expected; longer unparsable text is reported as invalid
+
+
+class _Stream:
+    """
+    JSON text read from a file in chunks. Consumed text is dropped when a chunk is appended,
+    so memory is bounded by the chunk size and not by the size of the file.
+    """
+    def __init__(self, f, chunk_size=CHUNK_SIZE):
+        self.f = io.StringIO(f) if isinstance(f, str) else f
+        self.chunk_size = chunk_size
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def more(self):
+        """Append the next chunk; False at the end of the file."""
+        if self.eof:
+            return False
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buf = self.buf[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """Skip whitespace and return the next character ('' at the end of the file)."""
+        while True:
+            self.pos = _WS.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.more():
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expecting '{char}' in GP2IDSMAPPER JSON")
+        self.pos += 1
+
+    def decode(self, parse):
+        """Apply parse(buf, pos) -> (value, end), appending chunks until the value is complete."""
+        while True:
+            try:
+                value, end = parse(self.buf, self.pos)
+            except (ValueError, IndexError):  # truncated at the end of the buffer, or invalid
+                if len(self.buf) - self.pos <= MAX_VALUE_SIZE and self.more():
+                    continue
+                raise
+            self.pos = end
+            return value
+
+_value_decoder = json.JSONDecoder()
+
+def _parse_key(buf, pos):
+    if pos >= len(buf) or buf[pos] != '"':
+        raise ValueError('Expecting a string key in GP2IDSMAPPER JSON')
+    return scanstring(buf, pos + 1)
+
+def _next_member(stream):
+    """Consume the ',' after an object member; the object may end instead."""
+    char = stream.peek()
+    if char == ',':
+        stream.pos += 1
+        if stream.peek() == '}':
+            raise ValueError("Trailing ',' in GP2IDSMAPPER JSON")
+    elif char != '}':
+        raise ValueError("Expecting ',' or '}' in GP2IDSMAPPER JSON")
+
+def _expect_end(stream):
+    """Only whitespace may follow the top-level object (a concatenated or corrupted file is invalid)."""
+    if stream.peek() != '':
+        raise ValueError('Extra data after the top-level object of GP2IDSMAPPER JSON')
+
+def _read_study(stream, columns, keep):
+    """Read one {sample_id: [GP2sampleID, clinical_id]} object, entry by entry, into columns (if keep)."""
+    stream.expect('{')
+    n = 0
+    while stream.peek() != '}':
+        # plain entries of the buffer in one regex pass; the JSON decoder for the others
+        match = _ENTRY.match(stream.buf, stream.pos)
+        while match is not None:
+            if keep:
+                sample_id, gp2sampleid, clinical_id = match.groups()
+                columns['sample_id'].append(sample_id)
+                columns['GP2sampleID'].append(gp2sampleid)
+                columns['clinical_id'].append(clinical_id)
+            n += 1
+            stream.pos = match.end()
+            _next_member(stream)
+            match = _ENTRY.match(stream.buf, stream.pos)
+        if stream.peek() == '}':
+            break
+        sample_id = stream.decode(_parse_key)
+        stream.expect(':')
+        stream.peek()
+        gp2sampleid, clinical_id = stream.decode(_value_decoder.raw_decode)
+        if keep:
+            columns['sample_id'].append(sample_id)
+            columns['GP2sampleID'].append(gp2sampleid)
+            columns['clinical_id'].append(clinical_id)
+        n += 1
+        _next_member(stream)
+    stream.pos += 1
+    return n
+
+def _new_columns():
+    return {'study': [], 'sample_id': [], 'GP2sampleID': [], 'clinical_id': []}
+
+def parse_study_columns(f, study, columns=None):
+    """
+    Parse one study shard ({sample_id: [GP2sampleID, clinical_id]}) incrementally into column lists.
+
+    Args:
+        f (file or str): Text file opened for reading (or the JSON text).
+
+    Returns:
+        dict: {'study': [...], 'sample_id': [...], 'GP2sampleID': [...], 'clinical_id': [...]}
+    """
+    columns = _new_columns() if columns is None else columns
+    stream = _Stream(f)
+    n = _read_study(stream, columns, keep=True)
+    _expect_end(stream)
+    columns['study'].extend([study] * n)
+    return columns
+
+def parse_mapper_columns(f, studies=None, columns=None):
+    """
+    Parse GP2IDSMAPPER.json ({study: {sample_id: [GP2sampleID, clinical_id]}}) incrementally into column lists,
+    without building the nested dicts or holding the whole text. Studies not in `studies` are skipped.
+
+    Args:
+        f (file or str): Text file opened for reading (or the JSON text).
+
+    Returns:
+        dict: {'study': [...], 'sample_id': [...], 'GP2sampleID': [...], 'clinical_id': [...]}
+    """
+    columns = _new_columns() if columns is None else columns
+    stream = _Stream(f)
+    if stream.peek() != '{':
+        raise ValueError('GP2IDSMAPPER.json must be a JSON object')
+    stream.pos += 1
+    while stream.peek() != '}':
+        study = stream.decode(_parse_key)
+        stream.expect(':')
+        keep = studies is None or study in studies
+        n = _read_study(stream, columns, keep)
+        if keep:
+            columns['study'].extend([study] * n)
+        _next_member(stream)
+    stream.pos += 1
+    _expect_end(stream)
+    return columns
@@ -0,0 +1,97 @@
+import argparse
+import json
+import os
+import shutil
+import pandas as pd
+from .schema import READ_DTYPE, apply_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+except ImportError:  # the store is optional; the master sheet CSV is read directly without pyarrow
+    pa = None
+
+# Study-partitioned Parquet copy of the all-study master sheet (hive layout: <store>/study=<study>/*.parquet).
+# Loading one study reads only its partition instead of parsing the whole CSV.
+SOURCE_FILE = '_source.json'
+
+
+def _csv_signature(master_sheet_path):
+    st = os.stat(master_sheet_path)
+    return {'path': os.path.abspath(master_sheet_path), 'size': st.st_size, 'mtime_ns': st.st_mtime_ns}
+
+def build_master_store(master_sheet_path, store_path):
+    """
+    Build the study-partitioned store from the master sheet CSV, replacing any previous store.
+    Numeric columns keep their inferred dtypes and all other columns are stored as strings.
+    """
+    if pa is None:
+        raise ImportError('build_master_store requires pyarrow (pip install gp2qc[arrow])')
+    mf = pd.read_csv(master_sheet_path, dtype=READ_DTYPE, low_memory=False)
+    columns = mf.columns.tolist()
+    object_cols = mf.select_dtypes(include='object').columns
+    mf[object_cols] = mf[object_cols].astype('string')  # mixed object columns would not convert to Arrow
+    table = pa.Table.from_pandas(mf, preserve_index=False)
+
+    tmp_path = f'{store_path.rstrip(os.sep)}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    ds.write_dataset(table, tmp_path, format='parquet', partitioning=['study'], partitioning_flavor='hive',
+                     file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'))
+    with open(os.path.join(tmp_path, SOURCE_FILE), 'w') as f:
+        json.dump({**_csv_signature(master_sheet_path), 'columns': columns}, f)
+    shutil.rmtree(store_path, ignore_errors=True)
+    os.replace(tmp_path, store_path)
+    print(f'Master store built at {store_path}: {len(mf)} rows, {mf["study"].nunique()} studies')
+
+def refresh_master_store(master_sheet_path, store_path):
+    """Rebuild the store only if the master sheet CSV changed since the store was built."""
+    source_path = os.path.join(store_path, SOURCE_FILE)
+    if os.path.exists(source_path):
+        with open(source_path) as f:
+            source = json.load(f)
+        signature = _csv_signature(master_sheet_path)
+        if all(source.get(key) == value for key, value in signature.items()):
+            return
+    build_master_store(master_sheet_path, store_path)
+
+def read_master_store(store_path, studies):
+    """Read only the partitions of the given studies. Columns come back in the master sheet order."""
+    if pa is None:
+        raise ImportError(f'Reading the master store {store_path} requires pyarrow (pip install gp2qc[arrow]); '
+                          'without it, pass the master sheet CSV instead')
+    with open(os.path.join(store_path, SOURCE_FILE)) as f:
+        columns = json.load(f)['columns']
+    dataset = ds.dataset(store_path, format='parquet', partitioning='hive', exclude_invalid_files=True)
+    table = dataset.to_table(filter=ds.field('study').isin(list(studies)))
+    mf = table.to_pandas()
+    mf['study'] = mf['study'].astype(object)  # partition values come back as categorical
+    return apply_schema(mf[[col for col in columns if col in mf.columns]].copy())
+
+def load_master_sheet(master_sheet_path, studies, store_path=None):
+    """
+    Load the rows of the given studies from the master sheet.
+
+    Args:
+        master_sheet_path (str): Master sheet CSV, or a store built by build_master_store.
+        studies (list): Studies to load.
+        store_path (str, optional): Store kept in sync with the CSV; refreshed first if the CSV changed.
+    """
+    if store_path is not None and pa is not None:
+        refresh_master_store(master_sheet_path, store_path)
+        return read_master_store(store_path, studies)
+    if os.path.isdir(master_sheet_path):
+        return read_master_store(master_sheet_path, studies)
+    mf = pd.read_csv(master_sheet_path, dtype=READ_DTYPE, low_memory=False)
+    return apply_schema(mf[mf['study'].isin(studies)].copy())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build or refresh the study-partitioned master sheet store.')
+    parser.add_argument('master_sheet_path', help='master sheet CSV')
+    parser.add_argument('store_path', help='directory of the Parquet store')
+    parser.add_argument('--force', action='store_true', help='rebuild even if the CSV did not change')
+    args = parser.parse_args()
+    if args.force:
+        build_master_store(args.master_sheet_path, args.store_path)
+    else:
+        refresh_master_store(args.master_sheet_path, args.store_path)
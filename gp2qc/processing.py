@@ -1,10 +1,13 @@
 # gp2qc/processing.py
 
 import pandas as pd
-from google.cloud import storage
-from io import BytesIO
-from .base_check import base_check
+from .storage_backend import as_backend
+from .blob_service import BlobService
+from .schema import apply_schema
+from .instrumentation import stage
+from .base_check import base_check, print_base_check_summary
 import glob
+import hashlib
 import re
 
 
@@ -31,11 +34,24 @@ def extract_qc_version_and_number(file_name):
     else:
         raise ValueError(f"selfQCVx and date required in the {file_name}")
 
+def frame_fingerprint(df):
+    """
+    Order-sensitive hash of the columns, dtypes, index and values of df. Two frames with the same fingerprint are
+    equal (up to hash collisions), so a fingerprint replaces keeping a copy to check whether df was modified.
+    """
+    digest = hashlib.md5(repr((df.columns.tolist(), df.dtypes.astype(str).tolist())).encode('utf-8'))
+    digest.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
 class GP2SampleManifesstProcessor:
-    def __init__(self, bucket_name):
-        # Initialize the Google Cloud Storage client and bucket
-        self.client = storage.Client()
-        self.bucket = self.client.bucket(bucket_name)
+    def __init__(self, bucket_name, storage=None, excel_engine=None):
+        # Storage of the submitted manifests: the GCS bucket (shared client, created on first use)
+        # unless another StorageBackend, e.g. a LocalBackend mirror, is given
+        self.bucket = as_backend(storage or bucket_name)
+        # pd.read_excel engine; None uses calamine when installed. Decoded sheets are cached locally per blob version
+        self.excel_engine = excel_engine
+        # lists, downloads and decodes the manifests on a thread pool (newest ones prefetched while the user chooses)
+        self.blob_service = BlobService(self.bucket, engine=excel_engine)
         self.base_checked = False
 
     def list_blobs(self, study):
@@ -43,16 +59,9 @@ class GP2SampleManifesstProcessor:
         List blobs in the Google Cloud Storage bucket with a specific study prefix
         and allow the user to choose a file by number.
         """
-        self.study = study
-        blobs1 = list(self.bucket.list_blobs(prefix=f"{study}/{study}"))
-        # Check if 'study' contains a hyphen, and only then list blobs with the modified prefix
-        if '-' in study:
-            blobs2 = list(self.bucket.list_blobs(prefix=f"{study.split('-')[0]}/{study}"))
-        else:
-            blobs2 = []  # Empty list if no hyphen
-        
-        # Create the list of file names, concatenating blobs1 and blobs2
-        file_list = [blob.name for blob in blobs1 + blobs2]
+        blob_infos = self.find_blobs(study)
+        self.blob_service.prefetch(blob_infos)  # download and decode the newest files during the prompt
+        file_list = [blob.name for blob in blob_infos]
         
         # Display the files with numbers
         print(f"\nBlobs in bucket for study {study}:")
@@ -71,17 +80,43 @@ class GP2SampleManifesstProcessor:
         if not (0 <= file_index < len(file_list)):
             print("Invalid selection. Please choose a valid file number.")
 
-        self.file_name = file_list[file_index]
+        self.load_blob(study, blob_infos[file_index])
+
+    def find_blobs(self, study):
+        """
+        Return BlobInfo of the submitted manifests of the study
+        ({study}/{study}... and, for hyphenated studies, {parent}/{study}..., listed concurrently).
+        """
+        return self.blob_service.list_study(study)
+
+    @stage('load_blob', frame=lambda args, kwargs, result: args[0].df)
+    def load_blob(self, study, blob, raise_error=False):
+        """
+        Load a submitted manifest without prompting (list_blobs does this for the chosen file).
+
+        Args:
+            study (str): Study of the manifest.
+            blob (str or BlobInfo): Manifest blob name or BlobInfo from find_blobs.
+            raise_error (bool): Raise read errors instead of printing them.
+        """
+        self.study = study
+        if isinstance(blob, str):
+            info = self.bucket.stat(blob)
+            if info is None:
+                raise FileNotFoundError(f'{self.bucket.uri(blob)} not found')
+            blob = info
+        self.file_name = blob.name
         print(f"Load: {self.file_name}")
-        blob = self.bucket.blob(self.file_name)
-        content = blob.download_as_bytes()
 
         try:
-            self.df = pd.read_excel(BytesIO(content), dtype={"sample_id": 'string', 'clinical_id': 'string'})
+            self.df = self.blob_service.read_manifest(blob)  # prefetched by list_blobs, if started
         except Exception as e:
+            if raise_error:
+                raise
             print("An error occurred while reading the file. Check the data in the google cloud")
             print(e)
         
+    @stage('assign_manifest_id', frame=lambda args, kwargs, result: args[0].df)
     def assign_manifest_id(self, mid):
         """
         Read a file from Google Cloud Storage and process it into a pandas DataFrame.
@@ -92,7 +127,7 @@ class GP2SampleManifesstProcessor:
 
         # Process the file based on its type
         if '_selfQCV2_' in self.file_name:
-            manifest_ids = self.df.manifest_id.unique()
+            manifest_ids = self.df.manifest_id.unique().tolist()
             if len(manifest_ids)>1:
                 raise ValueError(f'multiple manifest ID in the file: {manifest_ids}')
             manifest_id = manifest_ids[0]
@@ -106,27 +141,33 @@ class GP2SampleManifesstProcessor:
         
         # Add filename column to the dataframe
         self.df['filename'] = self.save_file_name
-        self.df_original = self.df.copy()
+        apply_schema(self.df)  # manifest_id is categorical again
+        self.df_fingerprint = frame_fingerprint(self.df)  # instead of a full copy to detect later modifications
         print(f"manifest_id={mid} assigned to the data.")
     
-    def basic_check(self):
+    @stage('basic_check', frame=lambda args, kwargs, result: args[0].df)
+    def basic_check(self, report=None):
         """
         Perform the base check on the processed DataFrame.
+
+        Args:
+            report (ValidationReport, optional): Result of base_check(self.df, collect_errors=True), reused
+                instead of checking the DataFrame again.
         """
         if not hasattr(self, 'df'):
             raise ValueError("No data loaded. Please read_file_and_process first.")
-        elif not hasattr(self, 'df_original'):
+        elif not hasattr(self, 'df_fingerprint'):
             raise ValueError("manifest_id needs to be assigned. Please assign_manifest_id first.")
 
-        # make sure df and df_original are pd.DataFrame.
+        # make sure df is a pd.DataFrame.
         if not isinstance(self.df, pd.DataFrame):
             raise TypeError("df is not a pandas DataFrame.")
-        if not isinstance(self.df_original, pd.DataFrame):
-            raise TypeError("df_original is not a pandas DataFrame.")
 
         # base_check
-        if self.df.equals(self.df_original):
-            base_check(self.df_original)
-        else:
+        if frame_fingerprint(self.df) != self.df_fingerprint:
             print("\nWARNING!! base_check on the modified dataframe.\n")
+        if report is None:
             base_check(self.df)
+        else:
+            report.raise_for_errors()
+            print_base_check_summary(self.df)
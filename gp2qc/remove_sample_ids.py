@@ -1,11 +1,9 @@
-import json
-from datetime import datetime
-from google.cloud import storage
+from .storage_backend import as_backend
+from .instrumentation import stage
+from .mapper_cache import update_masterids
 
-# Fixed bucket and storage client
+# Default bucket ($GP2QC_STORAGE_ROOT/<bucket_name> when set); the storage client is created on first use
 bucket_name = 'eu-samplemanifest'
-storage_client = storage.Client()
-bucket = storage_client.get_bucket(bucket_name)
 
 def remove_sample_ids_from_study(masterids, sample_ids, study_code):
     """
@@ -27,43 +25,30 @@ def remove_sample_ids_from_study(masterids, sample_ids, study_code):
 
         print(f"{len(ids_to_remove)} sample IDs have been deleted for {study_code}.")
 
-def remove_sample_ids(sample_ids, study_code):
+@stage('remove_sample_ids')
+def remove_sample_ids(sample_ids, study_code, bucket=None):
     """
     Removes specified sample IDs from GP2IDSMAPPER.json for a given study code.
     Additionally, if the study_code is "PPMI-N" or "PPMI-G", removes those IDs from both.
+    bucket (StorageBackend, optional) defaults to the eu-samplemanifest bucket.
     """
-    # Load the ID data from GP2IDSMAPPER.json
-    blob_id = bucket.blob('IDSTRACKER/GP2IDSMAPPER.json')
-    try:
-        masterids = json.loads(blob_id.download_as_text())
-    except Exception as e:
-        print(f"Error loading ID data: {e}")
-        return
-
-    # Remove sample IDs from the specified study
-    remove_sample_ids_from_study(masterids, sample_ids, study_code)
-
+    bucket = as_backend(bucket or bucket_name)
+    studies = [study_code]
     # If the study is "PPMI-N" or "PPMI-G", also remove sample IDs from both studies
     if study_code in {"PPMI-N", "PPMI-G"}:
         other_study = "PPMI-G" if study_code == "PPMI-N" else "PPMI-N"
         print(f'Also remove sample_ids from {other_study}')
-        remove_sample_ids_from_study(masterids, sample_ids, other_study)
+        studies.append(other_study)
 
-    # Backup the current GP2IDSMAPPER.json after successful removal
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-    new_blob_name = f'IDSTRACKER/ARCHIVE/GP2IDSMAPPER_before_rm_{study_code}_{timestamp}.json'
-    
-    try:
-        bucket.copy_blob(blob_id, bucket, new_blob_name)
-        print(f"Original GP2IDSMAPPER.json copied to gs://{bucket_name}/{new_blob_name}")
-    except Exception as e:
-        print(f"Error copying file: {e}")
-        return
+    def remove(study, study_ids):
+        if study_ids:
+            remove_sample_ids_from_study({study: study_ids}, sample_ids, study)
 
-    # Save the updated masterids to GP2IDSMAPPER.json
+    # Backup and write only if nobody changed the IDs in between (re-applied and retried otherwise)
     try:
-        blob_id.upload_from_string(json.dumps(masterids, indent=4))
-        print("Updated GP2IDSMAPPER.json saved successfully.")
+        update_masterids(bucket, studies, remove, f'before_rm_{study_code}')
+    except ValueError:
+        raise
     except Exception as e:
         print(f"Error saving updated IDs: {e}")
         return
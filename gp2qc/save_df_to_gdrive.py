@@ -1,14 +1,19 @@
-import os
+from .attribute_summary import ATTRIBUTE_SUMMARY_FILE, update_attribute_summary
+from .storage_backend import FINALIZED_DIR, LocalBackend, get_drive
 from .base_check import base_check
 from .check_idstracker import check_idstracker
+from .instrumentation import stage
 
-def save_df_to_gdrive(processor, root_path='/content/drive/Shareddrives/EUR_GP2/CIWG/sample_manifest/finalized'):
+@stage('save_df_to_gdrive', frame=lambda args, kwargs, result: args[0].df)
+def save_df_to_gdrive(processor, root_path=None, *, drive=None):
     """
-    Save the manifest DataFrame from GP2SampleManifestProcessor to the specified path.
+    Save the manifest DataFrame from GP2SampleManifestProcessor to the finalized folder of its study.
     
     Args:
         processor (GP2SampleManifestProcessor): An instance of the class containing `self.df`.
-        root_path (str): Path to save the combined manifest DataFrame.
+        root_path (str, optional): Local directory used as the finalized folder instead of the drive's FINALIZED_DIR.
+        drive (StorageBackend, optional): Shared drive holding FINALIZED_DIR; pass the StudyManifestHandler's
+            drive so the manifest and the attribute summary go where the handler reads them. Defaults to get_drive().
     """    
     base_check(processor.df)
     check_idstracker(processor.bucket, processor.study, processor.df)
@@ -23,23 +28,32 @@ def save_df_to_gdrive(processor, root_path='/content/drive/Shareddrives/EUR_GP2/
     if processor.save_file_name != file_name[0]:
         raise ValueError(f'{processor.save_file_name} is different from the filename in the df: {file_name[0]}')
 
-    if processor.study in ["PPMI-N", "PPMI-G"]:
-        save_path = os.path.join(root_path, 'PPMI', processor.save_file_name)
+    if root_path is not None:
+        drive, finalized_dir = LocalBackend(root_path), ''
     else:
-        save_path = os.path.join(root_path, processor.study, processor.save_file_name)
+        drive, finalized_dir = drive or get_drive(), f'{FINALIZED_DIR}/'
+    study_folder = 'PPMI' if processor.study in ["PPMI-N", "PPMI-G"] else processor.study
+    folder = f'{finalized_dir}{study_folder}'
+    save_path = f'{folder}/{processor.save_file_name}'
 
     # Check if the subdirectory exists, if not, raise an error
-    subdirectory_path = os.path.dirname(save_path)
-    if not os.path.exists(subdirectory_path):
-        raise ValueError(f"Subdirectory {subdirectory_path} does not exist.")
+    if not drive.exists(f'{folder}/'):
+        raise ValueError(f"Subdirectory {drive.uri(folder)} does not exist.")
     
     else:
         # Check if the file exists
-        if os.path.exists(save_path):
+        generation = drive.generation(save_path)
+        if generation is not None:
             user_input = input(f"The file {processor.save_file_name} already exists. Do you want to overwrite it? (yes/no): ").strip().lower()
             if user_input != 'yes':
                 print("File not overwritten.")
                 return
         
-    processor.df.to_csv(save_path, index=False)
-    print(f'Saving to the gdrive: {save_path}')
+    # only if nobody wrote the file since it was checked (GenerationMismatch otherwise)
+    drive.write_bytes(save_path, processor.df.to_csv(index=False), if_generation_match=generation or 0,
+                      content_type='text/csv')
+    print(f'Saving to the gdrive: {drive.uri(save_path)}')
+
+    # keep the attribute summary of the finalized folder (if materialized) in sync
+    if update_attribute_summary(drive, folder, processor.df):
+        print(f'Attribute summary updated: {drive.uri(f"{folder}/{ATTRIBUTE_SUMMARY_FILE}")}')
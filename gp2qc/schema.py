@@ -0,0 +1,55 @@
+import pandas as pd
+from .base_check import AGE_COLUMNS, ALLOWED_VALUES
+
+try:
+    import pyarrow  # noqa: F401
+    STRING_DTYPE = 'string[pyarrow]'  # IDs in one Arrow buffer instead of one Python object per entry
+except ImportError:
+    STRING_DTYPE = 'string'
+
+# Compact dtypes of the manifest columns, derived from the base_check lists. Every manifest reader (submitted
+# sheets, finalized manifests, master sheet) applies them, and so does every concatenation of manifests.
+ID_COLUMNS = ['GP2ID', 'clinical_id', 'GP2sampleID', 'sample_id']
+CATEGORY_COLUMNS = list(ALLOWED_VALUES)
+# dtype argument of pd.read_csv/pd.read_excel: IDs are parsed as strings (no numeric sample_id/clinical_id)
+READ_DTYPE = {column: STRING_DTYPE for column in ID_COLUMNS}
+# Part of the keys of the local caches of parsed manifests; bump when the dtypes change
+SCHEMA_VERSION = 1
+
+
+def _categories(s, allowed):
+    """The allowed values, in their order, followed by any other value observed in s."""
+    observed = pd.Index(s.dropna().unique())
+    extra = observed[~observed.isin(allowed)]
+    return pd.Index(allowed).append(extra.sort_values() if extra.inferred_type == 'string' else extra)
+
+def apply_schema(df):
+    """
+    Convert the manifest columns of df to their compact dtypes, in place:
+    - IDs: Arrow-backed strings ('string' without pyarrow)
+    - enumerated columns (ALLOWED_VALUES): categoricals of the allowed values plus any unallowed value observed,
+      so base_check still sees and reports unallowed values
+    - ages: float if numeric; other entries are left for base_check to report
+
+    Columns that already have their dtype are skipped, so re-applying after a concatenation only converts
+    the columns whose dtypes did not survive it (e.g. categoricals with different categories).
+
+    Args:
+        df (pd.DataFrame): Manifest(s); columns missing from df are ignored.
+
+    Returns:
+        pd.DataFrame: df.
+    """
+    for column in ID_COLUMNS:
+        if column in df.columns and df[column].dtype != STRING_DTYPE:
+            df[column] = df[column].astype(STRING_DTYPE)
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            s = df[column]
+            df[column] = s.astype(pd.CategoricalDtype(_categories(s, ALLOWED_VALUES[column])))
+    for column in AGE_COLUMNS:
+        if column in df.columns:
+            s = df[column]
+            if (pd.api.types.is_numeric_dtype(s.dtype) or s.isna().all()) and s.dtype != 'float64':
+                df[column] = s.astype('float64')
+    return df
@@ -0,0 +1,244 @@
+import glob
+import json
+import os
+import shutil
+import threading
+from typing import NamedTuple
+from .instrumentation import record_transfer
+
+# Shared drive (mounted in Colab) holding the finalized manifests and the QC tools.
+# Set $GP2QC_DRIVE_ROOT to run against a local mirror.
+DRIVE_ROOT = os.environ.get('GP2QC_DRIVE_ROOT', '/content/drive/Shareddrives/EUR_GP2/CIWG')
+FINALIZED_DIR = 'sample_manifest/finalized'
+TOOLS_DIR = 'tools'
+
+
+class BlobInfo(NamedTuple):
+    name: str
+    generation: int
+    size: int
+    md5_hash: str = None
+    metadata: dict = None
+
+
+class GenerationMismatch(Exception):
+    """Raised when an if_generation_match precondition fails (someone else changed the object)."""
+
+
+class StorageBackend:
+    """
+    Object storage used by the QC tools: GCS buckets and local directories (e.g. the mounted Drive or a local mirror).
+    Paths are '/'-separated names relative to the bucket or root directory. Every object has an integer
+    generation that changes on each write; if_generation_match=0 means the object must not exist yet.
+    """
+    name = None  # identifies the storage in local cache paths
+
+    def list(self, prefix=''):
+        """Return BlobInfo of all objects whose name starts with prefix."""
+        raise NotImplementedError
+
+    def stat(self, path):
+        """Return BlobInfo of the object, or None if it does not exist."""
+        raise NotImplementedError
+
+    def read_bytes(self, path, generation=None):
+        """Return the content of the object, failing with GenerationMismatch if it is no longer at generation."""
+        raise NotImplementedError
+
+    def write_bytes(self, path, data, if_generation_match=None, metadata=None, content_type=None):
+        """Write the object and return its new generation."""
+        raise NotImplementedError
+
+    def copy(self, src, dst, source_generation=None):
+        """Copy an object within the storage."""
+        raise NotImplementedError
+
+    def generation(self, path):
+        """Return the current generation of the object, or None if it does not exist."""
+        info = self.stat(path)
+        return None if info is None else info.generation
+
+    def exists(self, prefix):
+        """Return True if any object name starts with prefix."""
+        return len(self.list(prefix)) > 0
+
+    def uri(self, path):
+        """Return the full location of the object for messages."""
+        return f'{self.name}/{path}'
+
+
+class GCSBackend(StorageBackend):
+    """Google Cloud Storage bucket on the shared, connection-pooled client."""
+
+    def __init__(self, bucket):
+        if isinstance(bucket, str):
+            from .gcs import get_bucket
+            bucket = get_bucket(bucket)
+        self.bucket = bucket
+        self.name = bucket.name
+
+    @staticmethod
+    def _info(blob):
+        return BlobInfo(blob.name, blob.generation, blob.size, blob.md5_hash, blob.metadata)
+
+    def list(self, prefix=''):
+        return [self._info(blob) for blob in self.bucket.list_blobs(prefix=prefix)]
+
+    def stat(self, path):
+        blob = self.bucket.get_blob(path)  # metadata-only request
+        return None if blob is None else self._info(blob)
+
+    def read_bytes(self, path, generation=None):
+        from google.api_core.exceptions import PreconditionFailed
+        try:
+            data = self.bucket.blob(path).download_as_bytes(if_generation_match=generation)
+        except PreconditionFailed as e:
+            raise GenerationMismatch(f'gs://{self.name}/{path} is no longer at generation {generation}') from e
+        record_transfer(read=len(data))
+        return data
+
+    def write_bytes(self, path, data, if_generation_match=None, metadata=None, content_type=None):
+        from google.api_core.exceptions import PreconditionFailed
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        blob = self.bucket.blob(path)
+        if metadata is not None:
+            blob.metadata = metadata
+        try:
+            blob.upload_from_string(data, content_type=content_type or 'application/octet-stream',
+                                    if_generation_match=if_generation_match)
+        except PreconditionFailed as e:
+            raise GenerationMismatch(f'gs://{self.name}/{path} was changed by someone else') from e
+        record_transfer(written=len(data))
+        return blob.generation
+
+    def copy(self, src, dst, source_generation=None):
+        from google.api_core.exceptions import NotFound
+        try:
+            self.bucket.copy_blob(self.bucket.blob(src), self.bucket, dst, source_generation=source_generation)
+        except NotFound as e:
+            if source_generation is None:
+                raise
+            raise GenerationMismatch(f'gs://{self.name}/{src} is no longer at generation {source_generation}') from e
+
+    def uri(self, path):
+        return f'gs://{self.name}/{path}'
+
+    def __repr__(self):
+        return f'GCSBackend(gs://{self.name})'
+
+
+class LocalBackend(StorageBackend):
+    """
+    Directory on the local filesystem, e.g. the mounted shared drive or a local mirror of the bucket.
+    The generation is the file's mtime in nanoseconds; object metadata is kept in a .gp2qc-metadata side directory.
+    Preconditions are checked under a process-wide lock, so concurrent writers must share one host.
+    """
+    _lock = threading.Lock()
+    _metadata_dir = '.gp2qc-metadata'
+
+    def __init__(self, root):
+        self.root = os.path.abspath(root)
+        self.name = 'local' + self.root.replace(os.sep, '_')
+
+    def local_path(self, path):
+        return os.path.join(self.root, *path.split('/'))
+
+    def _metadata_path(self, path):
+        return os.path.join(self.root, self._metadata_dir, *path.split('/')) + '.json'
+
+    def _info(self, path, st=None):
+        st = st or os.stat(self.local_path(path))
+        metadata_path = self._metadata_path(path)
+        metadata = None
+        if os.path.exists(metadata_path):
+            with open(metadata_path, 'r', encoding='utf-8') as f:
+                metadata = json.load(f)
+        return BlobInfo(path, st.st_mtime_ns, st.st_size, None, metadata)
+
+    def list(self, prefix=''):
+        base = self.local_path(prefix.rsplit('/', 1)[0]) if '/' in prefix else self.root
+        infos = []
+        for file_path in glob.glob(os.path.join(glob.escape(base), '**', '*'), recursive=True):
+            path = os.path.relpath(file_path, self.root).replace(os.sep, '/')
+            if path.startswith(prefix) and not path.startswith(self._metadata_dir) and os.path.isfile(file_path):
+                infos.append(self._info(path))
+        return sorted(infos)
+
+    def stat(self, path):
+        try:
+            return self._info(path)
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+
+    def read_bytes(self, path, generation=None):
+        with open(self.local_path(path), 'rb') as f:
+            data = f.read()
+            if generation is not None and os.fstat(f.fileno()).st_mtime_ns != generation:
+                raise GenerationMismatch(f'{self.local_path(path)} is no longer at generation {generation}')
+        record_transfer(read=len(data))
+        return data
+
+    def write_bytes(self, path, data, if_generation_match=None, metadata=None, content_type=None):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        file_path = self.local_path(path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with self._lock:
+            previous = self.generation(path) or 0
+            if if_generation_match is not None and previous != if_generation_match:
+                raise GenerationMismatch(f'{file_path} was changed by someone else')
+            tmp_path = f'{file_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, file_path)
+            if os.stat(file_path).st_mtime_ns <= previous:
+                # coarse mtime resolution: keep generations strictly increasing
+                os.utime(file_path, ns=(previous + 1, previous + 1))
+            metadata_path = self._metadata_path(path)
+            if metadata is not None:
+                os.makedirs(os.path.dirname(metadata_path), exist_ok=True)
+                with open(metadata_path, 'w', encoding='utf-8') as f:
+                    json.dump(metadata, f)
+            elif os.path.exists(metadata_path):
+                os.remove(metadata_path)  # a new object version starts without metadata, as on GCS
+            record_transfer(written=len(data))
+            return os.stat(file_path).st_mtime_ns
+
+    def copy(self, src, dst, source_generation=None):
+        if source_generation is not None and self.generation(src) != source_generation:
+            raise GenerationMismatch(f'{self.local_path(src)} is no longer at generation {source_generation}')
+        os.makedirs(os.path.dirname(self.local_path(dst)), exist_ok=True)
+        shutil.copyfile(self.local_path(src), self.local_path(dst))
+
+    def exists(self, prefix):
+        return os.path.exists(self.local_path(prefix.rstrip('/'))) or super().exists(prefix)
+
+    def uri(self, path):
+        return self.local_path(path)
+
+    def __repr__(self):
+        return f'LocalBackend({self.root})'
+
+
+def as_backend(bucket):
+    """Accept a StorageBackend, a google.cloud.storage.Bucket or a bucket name."""
+    if isinstance(bucket, StorageBackend):
+        return bucket
+    if isinstance(bucket, str):
+        return get_backend(bucket)
+    return GCSBackend(bucket)
+
+def get_backend(bucket_name):
+    """
+    Return the backend of a bucket: the GCS bucket, or bucket_name under $GP2QC_STORAGE_ROOT
+    when that is set (local mirror, no network).
+    """
+    storage_root = os.environ.get('GP2QC_STORAGE_ROOT')
+    if storage_root:
+        return LocalBackend(os.path.join(storage_root, bucket_name))
+    return GCSBackend(bucket_name)
+
+def get_drive():
+    """Return the shared drive (DRIVE_ROOT) as a LocalBackend."""
+    return LocalBackend(DRIVE_ROOT)
@@ -0,0 +1,128 @@
+import json
+import os
+import numpy as np
+import pandas as pd
+from .base_check import AGE_COLUMNS, ALL_COLUMNS, ALLOWED_VALUES
+from .storage_backend import FINALIZED_DIR, TOOLS_DIR
+
+# Synthetic manifests, master sheet and GP2IDSMAPPER for benchmarks and local dry runs.
+# The previous manifest (m1) holds one s1 sample per GP2ID; the new manifest (m2) resubmits half of them
+# as s2 (so they are checked for inconsistencies) and adds new GP2IDs.
+SIZES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000}
+STUDY_ARMS = {'PD': ('Case(/Control)', 'PD', 'PD'), 'Control': ('Case(/Control)', 'Control', 'Control'),
+              'DLB': ('Case(/Control)', 'DLB', 'DLB')}
+
+
+def _manifest(rng, study, gp2id_numbers, sample_rep_no, mid):
+    n = len(gp2id_numbers)
+    numbers = np.asarray(gp2id_numbers)
+    gp2ids = pd.Series(numbers).map(lambda i: f'{study}_{i:06d}').to_numpy(dtype=object)
+    # attributes are a function of the GP2ID so resubmissions agree unless an inconsistency is injected
+    arms = np.array(list(STUDY_ARMS), dtype=object)[numbers % len(STUDY_ARMS)]
+    df = pd.DataFrame({column: np.nan for column in ALL_COLUMNS}, index=range(n)).astype(object)
+    df['study'] = study
+    df['GP2ID'] = gp2ids
+    df['clinical_id'] = pd.Series(numbers).map(lambda i: f'clin-{i}').to_numpy(dtype=object)
+    df['SampleRepNo'] = sample_rep_no
+    df['GP2sampleID'] = gp2ids + f'_{sample_rep_no}'
+    df['sample_id'] = pd.Series(numbers).map(lambda i: f'{mid}-{i}').to_numpy(dtype=object)
+    df['study_arm'] = arms
+    df['study_type'] = [STUDY_ARMS[arm][0] for arm in arms]
+    df['diagnosis'] = [STUDY_ARMS[arm][1] for arm in arms]
+    df['GP2_phenotype'] = [STUDY_ARMS[arm][2] for arm in arms]
+    df['biological_sex_for_qc'] = np.array(ALLOWED_VALUES['biological_sex_for_qc'][:2], dtype=object)[numbers % 2]
+    df['race_for_qc'] = np.array(ALLOWED_VALUES['race_for_qc'], dtype=object)[numbers % len(ALLOWED_VALUES['race_for_qc'])]
+    df['family_history_for_qc'] = np.array(['Yes', 'No'], dtype=object)[numbers % 2]
+    df['region_for_qc'] = 'USA'
+    df['manifest_id'] = mid
+    df['Genotyping_site'] = 'SYN'
+    df['filename'] = f'{study}_selfQCV3_20240601_{mid}.csv'
+    for column in AGE_COLUMNS:
+        df[column] = rng.integers(20, 90, n).astype(float)
+    return df
+
+def make_manifests(n_rows, study='SYN', error_rate=0.0, inconsistency_rate=0.0, seed=0):
+    """
+    Generate a previous manifest (m1) and a new manifest (m2) of n_rows rows each.
+
+    Args:
+        n_rows (int or str): Rows per manifest, or one of SIZES ('10k', '100k', '1M').
+        study (str): Study code.
+        error_rate (float): Fraction of new rows given a base_check error (unallowed value, non-numeric age,
+            duplicated sample_id or malformed ID, in turn).
+        inconsistency_rate (float): Fraction of resubmitted GP2IDs whose biological_sex_for_qc is flipped.
+        seed (int): Random seed.
+
+    Returns:
+        tuple: (previous, new) DataFrames with the columns of the template.
+    """
+    n_rows = SIZES.get(n_rows, n_rows)
+    rng = np.random.default_rng(seed)
+    previous = _manifest(rng, study, np.arange(n_rows), 's1', 'm1')
+    n_resubmitted = n_rows // 2
+    new = pd.concat([_manifest(rng, study, np.arange(n_resubmitted), 's2', 'm2'),
+                     _manifest(rng, study, np.arange(n_rows, 2 * n_rows - n_resubmitted), 's1', 'm2')],
+                    ignore_index=True)
+
+    n_inconsistent = int(n_resubmitted * inconsistency_rate)
+    if n_inconsistent:
+        rows = rng.choice(n_resubmitted, n_inconsistent, replace=False)
+        new.loc[rows, 'biological_sex_for_qc'] = new.loc[rows, 'biological_sex_for_qc'].map(
+            {'Male': 'Female', 'Female': 'Male'})
+
+    n_errors = int(len(new) * error_rate)
+    if n_errors:
+        rows = rng.choice(len(new), n_errors, replace=False)
+        for kind, kind_rows in enumerate(np.array_split(rows, 4)):
+            if kind == 0:
+                new.loc[kind_rows, 'race_for_qc'] = 'Martian'
+            elif kind == 1:
+                new['age'] = new['age'].astype(object)
+                new.loc[kind_rows, 'age'] = 'unknown'
+            elif kind == 2:
+                new.loc[kind_rows, 'sample_id'] = new.loc[0, 'sample_id']
+            else:
+                new.loc[kind_rows, 'clinical_id'] = new.loc[kind_rows, 'clinical_id'] + '#'
+    return previous, new
+
+def make_masterids(*dfs):
+    """GP2IDSMAPPER dict {study: {sample_id: [GP2sampleID, clinical_id]}} of the given manifests."""
+    masterids = {}
+    for df in dfs:
+        for study, t in df.groupby('study', sort=False):
+            masterids.setdefault(study, {}).update(
+                zip(t['sample_id'], ([g, c] for g, c in zip(t['GP2sampleID'], t['clinical_id']))))
+    return masterids
+
+def write_local_fixture(root, n_rows, study='SYN', error_rate=0.0, inconsistency_rate=0.0, seed=0, excel=None,
+                        bucket_name='eu-samplemanifest'):
+    """
+    Write a local mirror to run the QC against (GP2QC_STORAGE_ROOT=root, GP2QC_DRIVE_ROOT=root/drive):
+    root/master.csv (previous manifest), root/drive/{FINALIZED_DIR}/{study}/, root/drive/{TOOLS_DIR}/ and
+    root/{bucket_name}/IDSTRACKER/GP2IDSMAPPER.json with the IDs of both manifests. The new manifest is written as
+    root/{bucket_name}/{study}/{study}_selfQCV3_20240601.xlsx if excel (default: up to 10k rows) and as
+    root/new_manifest.csv.
+
+    Returns:
+        tuple: (previous, new) DataFrames.
+    """
+    previous, new = make_manifests(n_rows, study, error_rate, inconsistency_rate, seed)
+    bucket_root = os.path.join(root, bucket_name)
+    os.makedirs(os.path.join(bucket_root, 'IDSTRACKER'), exist_ok=True)
+    os.makedirs(os.path.join(bucket_root, study), exist_ok=True)
+    os.makedirs(os.path.join(root, 'drive', *FINALIZED_DIR.split('/'), study), exist_ok=True)
+    tools_dir = os.path.join(root, 'drive', *TOOLS_DIR.split('/'))
+    os.makedirs(tools_dir, exist_ok=True)
+
+    previous.to_csv(os.path.join(root, 'master.csv'), index=False)
+    new.drop(columns=['manifest_id', 'filename']).to_csv(os.path.join(root, 'new_manifest.csv'), index=False)
+    if excel or (excel is None and len(new) <= SIZES['10k']):
+        new.drop(columns=['manifest_id', 'filename']).to_excel(
+            os.path.join(bucket_root, study, f'{study}_selfQCV3_20240601.xlsx'), index=False)
+    with open(os.path.join(tools_dir, 'R7_GP2sampleID_with_same_sample_id.txt'), 'w') as f:
+        f.write('')
+    pd.DataFrame(columns=['GP2sampleID', 'clinical_id']).to_csv(
+        os.path.join(tools_dir, 'clinical_id_corrected.csv'), index=False)
+    with open(os.path.join(bucket_root, 'IDSTRACKER', 'GP2IDSMAPPER.json'), 'w') as f:
+        json.dump(make_masterids(previous, new), f)
+    return previous, new
@@ -0,0 +1,73 @@
+import json
+import pandas as pd
+
+FINDING_COLUMNS = ['column', 'value', 'index']
+
+
+class ValidationReport:
+    """
+    All problems found by base_check(df, collect_errors=True) instead of only the first one.
+    Each issue has the check name, a severity ('error' or 'warning'), the message base_check would print or raise,
+    and its findings: one row per offending entry with 'column', 'value' and 'index' (row label in the checked df;
+    None for column-level problems such as a missing column).
+    """
+    def __init__(self):
+        self.issues = []
+
+    def add(self, check, message, findings=None, severity='error'):
+        if findings is None:
+            findings = pd.DataFrame(columns=FINDING_COLUMNS)
+        self.issues.append({'check': check, 'severity': severity, 'message': message,
+                            'findings': findings[FINDING_COLUMNS].reset_index(drop=True)})
+
+    @property
+    def errors(self):
+        return [issue for issue in self.issues if issue['severity'] == 'error']
+
+    @property
+    def warnings(self):
+        return [issue for issue in self.issues if issue['severity'] == 'warning']
+
+    @property
+    def ok(self):
+        return not self.errors
+
+    def raise_for_errors(self):
+        """Raise the ValueError base_check raises: the message of the first failing check."""
+        if self.errors:
+            raise ValueError(self.errors[0]['message'])
+
+    def to_frame(self):
+        """One row per finding with 'check', 'severity', 'message', 'column', 'value' and 'index'."""
+        frames = []
+        for issue in self.issues:
+            findings = issue['findings']
+            if findings.empty:
+                findings = pd.DataFrame({column: [None] for column in FINDING_COLUMNS})
+            frames.append(findings.assign(check=issue['check'], severity=issue['severity'], message=issue['message']))
+        columns = ['check', 'severity', 'message'] + FINDING_COLUMNS
+        if not frames:
+            return pd.DataFrame(columns=columns)
+        return pd.concat(frames, ignore_index=True)[columns]
+
+    def to_csv(self, path):
+        self.to_frame().to_csv(path, index=False)
+
+    def to_json(self, path=None):
+        """Serialize the issues (findings nested per issue). Returns the JSON text if path is None."""
+        issues = [{'check': issue['check'], 'severity': issue['severity'], 'message': issue['message'],
+                   'findings': json.loads(issue['findings'].to_json(orient='records', default_handler=str))}
+                  for issue in self.issues]
+        text = json.dumps({'ok': self.ok, 'issues': issues}, indent=2)
+        if path is None:
+            return text
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def __repr__(self):
+        if not self.issues:
+            return 'ValidationReport(ok)'
+        lines = [f"ValidationReport({len(self.errors)} errors, {len(self.warnings)} warnings)"]
+        for issue in self.issues:
+            lines.append(f"- [{issue['severity']}] {issue['check']}: {issue['message']} ({len(issue['findings'])} entries)")
+        return '\n'.join(lines)
@@ -0,0 +1,9 @@
+from gp2qc.benchmark import MEMORY_LIMIT, run_memory_checks
+
+
+def test_validation_and_consistency_peak_memory(tmp_path):
+    """base_check and the consistency stages stay within MEMORY_LIMIT times their input on a synthetic study."""
+    results = run_memory_checks(10_000, workdir=str(tmp_path))
+    assert set(results['benchmark']) >= {'base_check', 'find_inconsistencies'}
+    failed = results[~results['passed']]
+    assert failed.empty, f'peak memory above {MEMORY_LIMIT}x the input:\n{failed.to_string(index=False)}'